@@ -1,15 +1,14 @@
 import json
 import logging
 import re
-from datetime import datetime
-from zoneinfo import ZoneInfo
 
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
 from langfuse import Langfuse, get_client, observe, propagate_attributes
 
 from config.settings import settings
+from core.clock import now
+from core.llm_clients import get_llm
 from core.prompt_loader import load_prompt_config
 
 load_dotenv()
@@ -82,10 +81,6 @@ SOFT_FALSE_POSITIVE_REASON_PATTERNS = [
 ]
 
 
-def now():
-    return datetime.now(ZoneInfo("Asia/Singapore")).isoformat()
-
-
 def _append_disclaimer(text: str) -> str:
     if not text:
         return MEDICAL_DISCLAIMER
@@ -145,7 +140,7 @@ def _looks_like_soft_false_positive(reasons: list[str]) -> bool:
 
 
 @observe(as_type="generation")
-def compliance_node(state):
+async def compliance_node(state):
     """
     Generate insight summary from report text using LLM.
     """
@@ -188,8 +183,8 @@ def compliance_node(state):
         # langfuse prompt managment (END)
 
         # Call LLM for classification with config from prompts.json
-        llm = ChatOpenAI(model=model, temperature=temperature)
-        response = llm.invoke(
+        llm = get_llm(model, temperature)
+        response = await llm.ainvoke(
             [
                 SystemMessage(content=system_prompt),
                 HumanMessage(content=state.pre_compliance_response),
@@ -1,13 +1,13 @@
 import logging
-from datetime import datetime
-from zoneinfo import ZoneInfo
 
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
 from langfuse import Langfuse, get_client, observe, propagate_attributes
 
 from config.settings import settings
+from core.clock import now
+from core.llm_cache import LLMResponseCache
+from core.llm_clients import get_llm
 from core.prompt_loader import load_prompt_config
 
 load_dotenv()
@@ -21,13 +21,20 @@ langfusePrompt = Langfuse(
 )
 langfuse = get_client()
 
+# The model answers with this label instead of an analysis for non-health documents
+OFF_TOPIC = "OFF_TOPIC"
+OFF_TOPIC_MESSAGE = "The document does not appear to be health-related."
 
-def now():
-    return datetime.now(ZoneInfo("Asia/Singapore")).isoformat()
+# Re-uploaded documents produce identical sanitized text, so the analysis can be reused.
+analysis_cache = LLMResponseCache(
+    "clinical_analysis",
+    maxsize=settings.LLM_CACHE_MAX_ENTRIES,
+    ttl=settings.LLM_CACHE_TTL_SECONDS,
+)
 
 
 @observe(as_type="generation")
-def clinical_analysis_node(state):
+async def clinical_analysis_node(state):
     """
     Send report text to LLM for clinical analysis.
     """
@@ -49,7 +56,7 @@ def clinical_analysis_node(state):
             model = config.get("model", "gpt-4o-mini")
             temperature = config.get("temperature", 0.2)
             logger.info(
-                f"Langfuse prompt fetched successfully: version {prompt.version}"
+                "Langfuse prompt fetched successfully: version %s", prompt.version
             )
         except Exception:
             # fallback to local prompt config if langfuse prompt retrieval fails
@@ -62,21 +69,35 @@ def clinical_analysis_node(state):
             prompt = None
         # langfuse prompt managment (END)
 
-        # Call LLM for classification with config from prompts.json
-        llm = ChatOpenAI(model=model, temperature=temperature)
-        response = llm.invoke(
-            [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=state.sanitized_text),
-            ]
+        cache_key = LLMResponseCache.make_key(
+            model, temperature, system_prompt, state.sanitized_text
         )
+        result = analysis_cache.get(cache_key)
+
+        if result is None:
+            # Call LLM for classification with config from prompts.json
+            llm = get_llm(model, temperature)
+            response = await llm.ainvoke(
+                [
+                    SystemMessage(content=system_prompt),
+                    HumanMessage(content=state.sanitized_text),
+                ]
+            )
 
-        # Update langfuse monitoring w/o prompt management
-        langfuse.update_current_generation(
-            usage_details=response.response_metadata.get("token_usage"),
-            model=response.response_metadata.get("model_name"),
-            prompt=prompt,
-        )
+            # Update langfuse monitoring w/o prompt management
+            langfuse.update_current_generation(
+                usage_details=response.response_metadata.get("token_usage"),
+                model=response.response_metadata.get("model_name"),
+                prompt=prompt,
+            )
+
+            result = response.content.strip().upper()
+            analysis_cache.set(cache_key, result)
+        else:
+            logger.info(
+                "Clinical analysis served from cache (hit rate %.2f)",
+                analysis_cache.stats()["hit_rate"],
+            )
 
         # Add langfuse session tracking
         with propagate_attributes(
@@ -86,29 +107,16 @@ def clinical_analysis_node(state):
         ):
             pass
 
-        result = response.content.strip().upper()
-
-        if result == "OFF_TOPIC" and state.input_text:
-            logger.info(
-                "Document classified as OFF_TOPIC with user input. Routing to QnA node."
-            )
-            return {
-                "clinical_analysis": "The document does not appear to be health-related.",
-                "insights_summary": "The document does not appear to be health-related.",
-                "sanitized_text": None,  # Clear sanitized text as not required for QnA
-                "next_node": "qna",
-                "last_updated": now(),
-            }
-        elif result == "OFF_TOPIC" and (
-            state.input_text is None or state.input_text.strip() == ""
-        ):
+        # Only uploads without user text get here; with text, pii_removal
+        # routes to combined_analysis instead
+        if result == OFF_TOPIC:
             logger.info(
                 "Document classified as OFF_TOPIC with no user input. Routing to Compliance node."
             )
             return {
-                "clinical_analysis": "The document does not appear to be health-related.",
-                "insights_summary": "The document does not appear to be health-related.",
-                "pre_compliance_response": "The document does not appear to be health-related.",
+                "clinical_analysis": OFF_TOPIC_MESSAGE,
+                "insights_summary": OFF_TOPIC_MESSAGE,
+                "pre_compliance_response": OFF_TOPIC_MESSAGE,
                 "sanitized_text": None,  # Clear sanitized text as not required for compliance
                 "next_node": "compliance",
                 "final_response": "Document uploaded is not health-related. Please provide health-related input for analysis.",
@@ -121,14 +129,13 @@ def clinical_analysis_node(state):
             return {
                 "clinical_analysis": result,
                 "next_node": "risk_assessment",
-                "sanitized_text": None,  # Clear sanitized text as not required for risk_assessment
                 "last_updated": now(),
             }
 
     except Exception as e:
         msg = str(e)
         short_msg = msg[:100] if len(msg) > 100 else msg
-        logger.error(f"Error Encountered: {short_msg}")
+        logger.error("Error Encountered: %s", short_msg)
         return {
             "next_node": "end",
             "sanitized_text": None,  # Clear sanitized text on error
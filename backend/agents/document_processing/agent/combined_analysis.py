@@ -0,0 +1,175 @@
+import json
+import logging
+
+from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage, SystemMessage
+from langfuse import Langfuse, get_client, observe, propagate_attributes
+
+from agents.document_processing.agent.clinical_analysis import clinical_analysis_node
+from config.settings import settings
+from core.clock import now
+from core.context_builder import build_context
+from core.llm_clients import get_llm
+from core.prompt_loader import load_prompt_config
+from core.text_checks import (
+    detect_medical_output_risk,
+    detect_prompt_injection,
+    sanitize_user_input,
+)
+
+load_dotenv()
+
+logger = logging.getLogger("combined_analysis")
+
+langfusePrompt = Langfuse(
+    public_key=settings.LANGFUSE_PUBLIC_KEY,
+    secret_key=settings.LANGFUSE_SECRET_KEY,
+    host=settings.LANGFUSE_BASE_URL,
+)
+langfuse = get_client()
+
+OFF_TOPIC_MESSAGE = "The document does not appear to be health-related."
+BLOCKED_ANSWER = "Your request cannot be processed due to suspicious content."
+
+
+def _analysis_text(analysis) -> str:
+    """
+    Flatten the "analysis" field to text; in JSON mode the model sometimes
+    returns it as structured data rather than a string.
+    """
+    if not isinstance(analysis, str):
+        analysis = json.dumps(analysis, ensure_ascii=False)
+    return analysis.strip().upper()
+
+
+@observe(as_type="generation")
+async def combined_analysis_node(state):
+    """
+    Clinical analysis of the uploaded document and answer to the user's question
+    in a single LLM call (replaces clinical_analysis + qna for file + text input).
+    """
+
+    try:
+        # Same input checks as the QnA agent. A suspicious question never
+        # reaches the LLM: the document is analysed on its own and the
+        # question gets the QnA agent's refusal.
+        if detect_prompt_injection(state.input_text):
+            logger.warning(
+                "Suspicious question with document upload; analysing the document only."
+            )
+            result = await clinical_analysis_node(state)
+            if result["next_node"] == "end":
+                return result
+            # Off-topic documents still go through compliance with the refusal
+            result.pop("final_response", None)
+            return {
+                **result,
+                "qna_answer": BLOCKED_ANSWER,
+                "pre_compliance_response": "Blocked Suspicious Prompt",
+            }
+        state.input_text = sanitize_user_input(state.input_text)
+
+        # Load prompt config from JSON
+        version = settings.PROMPT_VERSIONS.get(
+            "combined_analysis", settings.DEFAULT_PROMPT_VERSION
+        )
+        analysis_config = load_prompt_config(
+            module="combined_analysis", key="combined_analysis", version=version
+        )
+
+        # langfuse prompt managment (START)
+        try:
+            prompt = langfusePrompt.get_prompt("combined_analysis/systemPrompt")
+            system_prompt = prompt.compile()
+            config = prompt.config
+            model = config.get("model", "gpt-4o-mini")
+            temperature = config.get("temperature", 0.2)
+            logger.info(
+                "Langfuse prompt fetched successfully: version %s", prompt.version
+            )
+        except Exception:
+            # fallback to local prompt config if langfuse prompt retrieval fails
+            logger.info(
+                "Failed to load system prompt from Langfuse, falling back to local prompt config."
+            )
+            system_prompt = analysis_config["system"]
+            model = analysis_config["model"]
+            temperature = analysis_config["temperature"]
+            prompt = None
+        # langfuse prompt managment (END)
+
+        # Position identifiers [1]/[2] tie each section to its task in the system prompt
+        user_content = (
+            f"[1] DOCUMENT:\n{state.sanitized_text}\n\n"
+            f"[2] QUESTION CONTEXT:\n{build_context(state)}"
+        )
+
+        # Call LLM in JSON mode with config from prompts.json
+        llm = get_llm(model, temperature).bind(response_format={"type": "json_object"})
+        response = await llm.ainvoke(
+            [
+                SystemMessage(content=system_prompt),
+                HumanMessage(content=user_content),
+            ]
+        )
+
+        # Update langfuse monitoring w/o prompt management
+        langfuse.update_current_generation(
+            usage_details=response.response_metadata.get("token_usage"),
+            model=response.response_metadata.get("model_name"),
+            prompt=prompt,
+        )
+
+        # Add langfuse session tracking
+        with propagate_attributes(
+            session_id=state.session_id,
+            user_id=state.session_id,
+            trace_name="combined_analysis",
+        ):
+            pass
+
+        result = json.loads(response.content)
+        topic = str(result.get("topic", "")).strip().upper()
+        answer = str(result.get("answer", "")).strip()
+
+        if detect_medical_output_risk(answer):
+            logger.warning(
+                "Potential medical advice detected in LLM output. Modifying response to ensure safety."
+            )
+            answer += "\n\n Disclaimer: The response contains information that may be considered medical advice. Please consult a qualified healthcare professional for personalized guidance."
+
+        if topic == "OFF_TOPIC":
+            logger.info(
+                "Document classified as OFF_TOPIC with user input. Routing to Compliance node."
+            )
+            return {
+                "clinical_analysis": OFF_TOPIC_MESSAGE,
+                "insights_summary": OFF_TOPIC_MESSAGE,
+                "qna_answer": answer,
+                "pre_compliance_response": answer,
+                "sanitized_text": None,  # Clear sanitized text as not required for compliance
+                "next_node": "compliance",
+                "last_updated": now(),
+            }
+
+        logger.info(
+            "Document classified as medical/health related. Proceeding with analysis."
+        )
+        return {
+            "clinical_analysis": _analysis_text(result.get("analysis", "")),
+            "qna_answer": answer,
+            "pre_compliance_response": answer,
+            "next_node": "risk_assessment",
+            "last_updated": now(),
+        }
+
+    except Exception as e:
+        msg = str(e)
+        short_msg = msg[:100] if len(msg) > 100 else msg
+        logger.error("Error Encountered: %s", short_msg)
+        return {
+            "next_node": "end",
+            "sanitized_text": None,  # Clear sanitized text on error
+            "final_response": "An error has occurred. Please try again later.",
+            "last_updated": now(),
+        }
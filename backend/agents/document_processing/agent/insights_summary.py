@@ -1,13 +1,12 @@
 import logging
-from datetime import datetime
-from zoneinfo import ZoneInfo
 
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
 from langfuse import Langfuse, get_client, observe, propagate_attributes
 
 from config.settings import settings
+from core.clock import now
+from core.llm_clients import get_llm
 from core.prompt_loader import load_prompt_config
 
 load_dotenv()
@@ -22,12 +21,8 @@ langfusePrompt = Langfuse(
 langfuse = get_client()
 
 
-def now():
-    return datetime.now(ZoneInfo("Asia/Singapore")).isoformat()
-
-
 @observe(as_type="generation")
-def insights_summary_node(state):
+async def insights_summary_node(state):
     """
     Generate insight summary from report text using LLM.
     """
@@ -70,8 +65,8 @@ def insights_summary_node(state):
         {state.risk_assessment}"""
 
         # Call LLM for classification with config from prompts.json
-        llm = ChatOpenAI(model=model, temperature=temperature)
-        response = llm.invoke(
+        llm = get_llm(model, temperature)
+        response = await llm.ainvoke(
             [
                 SystemMessage(content=system_prompt),
                 HumanMessage(content=combined_content),
@@ -95,7 +90,17 @@ def insights_summary_node(state):
 
         result = response.content.strip()
 
-        if state.input_text:
+        if state.input_text and state.qna_answer:
+            logger.info(
+                "User question already answered alongside the clinical analysis. Routing to Compliance agent for further processing."
+            )
+            return {
+                "insights_summary": result,
+                "pre_compliance_response": state.qna_answer,
+                "next_node": "compliance",
+                "last_updated": now(),
+            }
+        elif state.input_text:
             logger.info("User entered text, past to QnA agent for further processing.")
             return {
                 "insights_summary": result,
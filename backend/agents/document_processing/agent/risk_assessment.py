@@ -1,13 +1,12 @@
 import logging
-from datetime import datetime
-from zoneinfo import ZoneInfo
 
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
 from langfuse import Langfuse, get_client, observe, propagate_attributes
 
 from config.settings import settings
+from core.clock import now
+from core.llm_clients import get_llm
 from core.prompt_loader import load_prompt_config
 
 load_dotenv()
@@ -22,12 +21,8 @@ langfusePrompt = Langfuse(
 langfuse = get_client()
 
 
-def now():
-    return datetime.now(ZoneInfo("Asia/Singapore")).isoformat()
-
-
 @observe(as_type="generation")
-def risk_assessment_node(state):
+async def risk_assessment_node(state):
     """
     Reviews medical records and generates a short, minimal summary of key health risks
     """
@@ -63,11 +58,11 @@ def risk_assessment_node(state):
         # langfuse prompt managment (END)
 
         # Call LLM for classification with config from prompts.json
-        llm = ChatOpenAI(model=model, temperature=temperature)
-        response = llm.invoke(
+        llm = get_llm(model, temperature)
+        response = await llm.ainvoke(
             [
                 SystemMessage(content=system_prompt),
-                HumanMessage(content=state.parsed_text),
+                HumanMessage(content=state.sanitized_text),
             ]
         )
 
@@ -90,6 +85,7 @@ def risk_assessment_node(state):
 
         return {
             "risk_assessment": result,
+            "sanitized_text": None,  # Clear sanitized text as not required for insights_summary
             "next_node": "insights_summary",
             "last_updated": now(),
         }
@@ -100,6 +96,7 @@ def risk_assessment_node(state):
         logger.error(f"Error Encountered: {short_msg}")
         return {
             "next_node": "end",
+            "sanitized_text": None,  # Clear sanitized text on error
             "final_response": "An error has occurred. Please try again later.",
             "last_updated": now(),
         }
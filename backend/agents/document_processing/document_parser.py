@@ -1,21 +1,127 @@
+import asyncio
 import logging
-from datetime import datetime
-from io import BytesIO
-from zoneinfo import ZoneInfo
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+from typing import List, Optional
 
 import pymupdf
 import pymupdf4llm
 from langfuse import observe, propagate_attributes
 
+from core.clock import now
+
 logger = logging.getLogger("document_parser")
 
+# PDFs with at least PARALLEL_MIN_PAGES pages are split into page batches and
+# converted in parallel. PyMuPDF is not thread-safe, so batches run in separate
+# processes that each re-open the document from the raw bytes. Spawned workers
+# re-import pymupdf and pickle the page text back, which only pays off with
+# several CPUs and a long document; on a single CPU it is slower than parsing
+# in-process, so the pool is never used there.
+PAGE_BATCH_SIZE = 8
+PARALLEL_MIN_PAGES = 32
+MAX_PARSE_WORKERS = 4
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+# Parses run in asyncio.to_thread workers, so the pool is created and replaced
+# under a lock
+_process_pool_lock = threading.Lock()
+
+
+def _parse_workers() -> int:
+    return min(os.cpu_count() or 1, MAX_PARSE_WORKERS)
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=_parse_workers(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _process_pool
+
+
+def _discard_process_pool(pool: ProcessPoolExecutor):
+    """
+    Drop a broken pool so the next document gets a fresh one. Another thread
+    may already have replaced it, in which case the replacement is kept.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is pool:
+            _process_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
 
-def now():
-    return datetime.now(ZoneInfo("Asia/Singapore")).isoformat()
+def wrap_untrusted(text: str) -> str:
+    """
+    Mark document text as data so downstream prompts never follow instructions inside it.
+    """
+    return f"<UNTRUSTED_DATA>\n{text}\n</UNTRUSTED_DATA>"
+
+
+def _page_markdown(doc, pages: Optional[List[int]] = None) -> List[str]:
+    chunks = pymupdf4llm.to_markdown(doc, pages=pages, page_chunks=True)
+    return [chunk["text"] for chunk in chunks]
+
+
+def _parse_page_range(file_bytes: bytes, pages: List[int]) -> List[str]:
+    doc = pymupdf.open(stream=file_bytes, filetype="pdf")
+    return _page_markdown(doc, pages)
+
+
+def _parse_pdf(file_bytes: bytes) -> List[str]:
+    """
+    Open the PDF and convert it to one markdown string per page.
+    CPU-bound; run it off the event loop.
+    """
+    # Pass the bytes straight through; a BytesIO wrapper is copied again via getvalue()
+    doc = pymupdf.open(stream=file_bytes, filetype="pdf")
+    page_count = doc.page_count
+
+    if page_count < PARALLEL_MIN_PAGES or _parse_workers() < 2:
+        return _page_markdown(doc)
+
+    batches = [
+        list(range(start, min(start + PAGE_BATCH_SIZE, page_count)))
+        for start in range(0, page_count, PAGE_BATCH_SIZE)
+    ]
+    logger.info("Parsing %d pages in %d parallel batches", page_count, len(batches))
+    pool = _get_process_pool()
+    try:
+        results = pool.map(_parse_page_range, repeat(file_bytes), batches)
+        return [page for batch in results for page in batch]
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed); drop the pool and parse this
+        # document in-process
+        logger.warning("PDF parse pool broke; parsing %d pages in-process", page_count)
+        _discard_process_pool(pool)
+        return _page_markdown(doc)
+    except RuntimeError:
+        # The pool was shut down under us (another thread saw it break, or the
+        # app is stopping); map refuses new work with a plain RuntimeError
+        logger.warning(
+            "PDF parse pool shut down; parsing %d pages in-process", page_count
+        )
+        return _page_markdown(doc)
 
 
 @observe()
-def document_parser_node(state):
+async def document_parser_node(state):
     """
     Parse PDF
     """
@@ -44,18 +150,20 @@ def document_parser_node(state):
 
         try:
             # Parse PDF
-            logger.info(f"Parsing: {filename}")
-            pdf_stream = BytesIO(file_bytes)
-            doc = pymupdf.open(stream=pdf_stream, filetype="pdf")
-            markdown_text = pymupdf4llm.to_markdown(doc)
-            safe_text = f"<UNTRUSTED_DATA>\n{markdown_text}\n</UNTRUSTED_DATA>"
-            logger.info(f"Extracted: {len(safe_text)} chars")
+            logger.info("Parsing: %s", filename)
+            pages = await asyncio.to_thread(_parse_pdf, file_bytes)
+            logger.info(
+                "Extracted: %d pages, %d chars", len(pages), sum(map(len, pages))
+            )
 
             # Route to PII Removal Agent
             logger.info("Parsed document, routing to PII removal")
 
             return {
-                "parsed_text": safe_text,
+                # Only the pages are passed on: PII removal anonymizes them one
+                # at a time and joins the result once, so the document is never
+                # held as both pages and a joined copy
+                "parsed_pages": pages,
                 "next_node": "pii_removal",
                 "last_updated": now(),
                 "file_bytes": None,  # clear file bytes after parsing
@@ -64,7 +172,7 @@ def document_parser_node(state):
         except Exception as e:
             msg = str(e)
             short_msg = msg[:100] if len(msg) > 100 else msg
-            logger.error(f"Error Encountered: {short_msg}")
+            logger.error("Error Encountered: %s", short_msg)
             return {
                 "next_node": "compliance",
                 "final_response": "An error has occurred. Please try again later.",
@@ -1,6 +1,4 @@
 import logging
-from datetime import datetime
-from zoneinfo import ZoneInfo
 
 from langfuse import observe, propagate_attributes
 from presidio_analyzer import AnalyzerEngine, Pattern, PatternRecognizer
@@ -8,6 +6,9 @@ from presidio_analyzer.nlp_engine import NlpEngineProvider
 from presidio_anonymizer import AnonymizerEngine
 from presidio_anonymizer.entities import OperatorConfig
 
+from agents.document_processing.document_parser import wrap_untrusted
+from core.clock import now
+
 logger = logging.getLogger("document_parser")
 
 # Explicitly configure Presidio to use en_core_web_md.
@@ -32,8 +33,57 @@ nric_recognizer = PatternRecognizer(
 analyzer.registry.add_recognizer(nric_recognizer)
 
 
-def now():
-    return datetime.now(ZoneInfo("Asia/Singapore")).isoformat()
+def _anonymize(text_input: str, pii_map: dict) -> str:
+    """
+    Replace PII in text_input with numbered placeholders, recording new values in pii_map.
+    """
+    # Restrict analyzer to only the PHI entities we care about
+    target_entities = [
+        "PERSON",  # names
+        "PHONE_NUMBER",  # phone
+        "EMAIL_ADDRESS",  # email
+        "LOCATION",  # address
+        "NRIC_FIN",  # custom
+    ]
+
+    # call presidio analyzer to detect PII >> returns a list of objects
+    results = analyzer.analyze(text=text_input, language="en", entities=target_entities)
+
+    for result in results:
+        value = text_input[result.start : result.end]
+        entity_type = result.entity_type
+
+        # Avoid assigning a new placeholder if the same raw value appears twice
+        if value not in pii_map:
+            pii_map[value] = f"[{entity_type}_{len(pii_map) + 1}]"
+
+    # Build one custom operator per entity type.
+    # The lambda looks up each individual value in pii_map so that
+    # different names of the same entity type get different placeholders.
+    snapshot = dict(pii_map)  # stable capture for the lambda
+
+    def make_replacer(lookup: dict):
+        def replacer(text: str) -> str:
+            return lookup.get(text, text)
+
+        return replacer
+
+    config_operators = {
+        entity: OperatorConfig("custom", {"lambda": make_replacer(snapshot)})
+        for entity in {r.entity_type for r in results}
+    }
+
+    # running the presidio anonymizer once all operators are configured
+    anonymized_result = anonymizer.anonymize(
+        text=text_input, analyzer_results=results, operators=config_operators
+    )
+
+    # anonymizer returns an AnonymizedResult object; extract the text field
+    return (
+        anonymized_result.text
+        if hasattr(anonymized_result, "text")
+        else str(anonymized_result)
+    )
 
 
 @observe()
@@ -49,71 +99,25 @@ def pii_removal_node(state):
         trace_name="pii_removal",
     ):
         try:
-            text_input = state.parsed_text
-
-            # Restrict analyzer to only the PHI entities we care about
-            target_entities = [
-                "PERSON",  # names
-                "PHONE_NUMBER",  # phone
-                "EMAIL_ADDRESS",  # email
-                "LOCATION",  # address
-                "NRIC_FIN",  # custom
-            ]
-
-            config_operators = {}
-
-            # call presidio analyzer to detect PII >> returns a list of objects
-            results = analyzer.analyze(
-                text=text_input, language="en", entities=target_entities
-            )
-
-            # initialize new and empty PII-Value mapping and count the number of PIIs
+            # initialize new and empty PII-Value mapping, shared across pages so
+            # the same raw value gets the same placeholder throughout the document
             pii_map = {}
-            counter = 1
-
-            for result in results:
-                value = text_input[result.start : result.end]
-                entity_type = result.entity_type
-
-                # Avoid assigning a new placeholder if the same raw value appears twice
-                if value not in pii_map:
-                    pii_map[value] = f"[{entity_type}_{counter}]"
-                    counter += 1
-
-            # Build one custom operator per entity type.
-            # The lambda looks up each individual value in pii_map so that
-            # different names of the same entity type get different placeholders.
-            snapshot = dict(pii_map)  # stable capture for the lambda
-
-            def make_replacer(lookup: dict):
-                def replacer(text: str) -> str:
-                    return lookup.get(text, text)
-
-                return replacer
-
-            config_operators = {
-                entity: OperatorConfig("custom", {"lambda": make_replacer(snapshot)})
-                for entity in {r.entity_type for r in results}
-            }
-
-            # running the presidio anonymizer once all operators are configured
-            anonymized_result = anonymizer.anonymize(
-                text=text_input, analyzer_results=results, operators=config_operators
-            )
 
-            # anonymizer returns an AnonymizedResult object; extract the text field
-            sanitized = (
-                anonymized_result.text
-                if hasattr(anonymized_result, "text")
-                else str(anonymized_result)
+            # Anonymize page by page so the NLP pipeline only ever holds one
+            # page in memory instead of the whole document
+            sanitized = wrap_untrusted(
+                "\n".join(
+                    _anonymize(page, pii_map) for page in state.parsed_pages or []
+                )
             )
 
-            logger.info(
-                f"Sanitized Content: {sanitized[:200]}..."
-            )  # Log first 200 chars of sanitized text
+            # Document text (even anonymized) only goes to the log at DEBUG
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Sanitized Content: %s...", sanitized[:200])
 
             return {
                 "sanitized_text": sanitized,
+                "parsed_pages": None,  # clear per-page text once sanitized
                 "next_node": "clinical_analysis",
                 "last_updated": now(),
             }
@@ -121,7 +125,7 @@ def pii_removal_node(state):
         except Exception as e:
             msg = str(e)
             short_msg = msg[:100] if len(msg) > 100 else msg
-            logger.error(f"Error Encountered: {short_msg}")
+            logger.error("Error Encountered: %s", short_msg)
             return {
                 "sanitized_text": "An error occurred while processing the document.",
                 "next_node": "compliance",
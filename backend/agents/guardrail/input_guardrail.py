@@ -1,19 +1,21 @@
+import asyncio
+import hashlib
 import json
 import logging
 import re
-from datetime import datetime
 from typing import Optional
-from zoneinfo import ZoneInfo
 
 from dotenv import load_dotenv
 from fastapi import HTTPException, UploadFile
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
 from langfuse import Langfuse, get_client, observe, propagate_attributes
 
 from config.settings import settings
+from core.clock import now
 from core.file_validators import FileValidator
+from core.llm_clients import get_llm
 from core.prompt_loader import load_prompt_config
+from core.text_checks import GREETING_RE
 
 load_dotenv()
 
@@ -29,10 +31,6 @@ langfuse = get_client()
 ERROR_FALLBACK_MESSAGE = "An error has occurred. Please try again later."
 
 
-def now():
-    return datetime.now(ZoneInfo("Asia/Singapore")).isoformat()
-
-
 @observe(as_type="generation")
 async def input_guardrail_node(state):
     """
@@ -46,8 +44,8 @@ async def input_guardrail_node(state):
 
         # 2. Rate limit checks
         session_data = state.session_data
-        message_count = session_data.get("message_count", 0)
-        upload_count = session_data.get("upload_count", 0)
+        message_count = session_data.message_count
+        upload_count = session_data.upload_count
 
         # Check max messages per session
         if message_count >= settings.MAX_MESSAGES_PER_SESSION:
@@ -80,11 +78,20 @@ async def input_guardrail_node(state):
         file_bytes = None
 
         if state.file:
-            # Validate file type
-            file_bytes = await state.file.read()
-            is_valid, error = FileValidator.validate_file(
-                file_bytes, state.file.filename
-            )
+            # Reject oversized uploads from the spooled upload's size before
+            # reading the whole body into memory
+            file_size = getattr(state.file, "size", None)
+            if file_size is not None:
+                is_valid, error = FileValidator.validate_size(file_size)
+            else:
+                is_valid = True
+
+            # Validate file type (libmagic sniffing runs off the event loop)
+            if is_valid:
+                file_bytes = await state.file.read()
+                is_valid, error = await asyncio.to_thread(
+                    FileValidator.validate_file, file_bytes, state.file.filename
+                )
             if not is_valid:
                 return {
                     "session_data": None,
@@ -100,6 +107,8 @@ async def input_guardrail_node(state):
                 "filename": state.file.filename,
                 "content_type": state.file.content_type,
                 "size": len(file_bytes),
+                # Identifies re-uploads of the same PDF so prior analysis can be reused
+                "content_hash": hashlib.blake2b(file_bytes, digest_size=16).hexdigest(),
             }
 
         # 4. Text prompt checks
@@ -130,8 +139,11 @@ async def input_guardrail_node(state):
                     "file": None,
                 }
 
-            # Spam/repetition check
-            if len(set(cleaned_text.replace(" ", ""))) < 5:
+            # Spam/repetition check; bare greetings ("hi") are short but
+            # legitimate, and the orchestrator answers them without classifying
+            if len(set(cleaned_text.replace(" ", ""))) < 5 and not GREETING_RE.match(
+                cleaned_text
+            ):
                 return {
                     "session_data": None,
                     "input_guardrail_passed": False,
@@ -194,8 +206,8 @@ async def input_guardrail_node(state):
             # langfuse prompt managment (END)
 
             # Call LLM for classification with config from prompts.json
-            llm = ChatOpenAI(model=model, temperature=temperature)
-            response = llm.invoke(
+            llm = get_llm(model, temperature)
+            response = await llm.ainvoke(
                 [
                     SystemMessage(content=system_prompt),
                     HumanMessage(content=state.input_text),
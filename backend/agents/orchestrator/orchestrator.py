@@ -1,15 +1,19 @@
+import asyncio
 import logging
-from datetime import datetime
-from zoneinfo import ZoneInfo
+import re
+from typing import Optional
 
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
 from langfuse import Langfuse, get_client, observe, propagate_attributes
 
 from config.settings import settings
+from core.clock import now
 from core.context_builder import build_context
+from core.llm_cache import LLMResponseCache
+from core.llm_clients import get_llm
 from core.prompt_loader import load_prompt_config
+from core.text_checks import GREETING_RE, detect_prompt_injection
 
 load_dotenv()
 
@@ -22,19 +26,335 @@ langfusePrompt = Langfuse(
 )
 langfuse = get_client()
 
+# Section separator for verbose logs; only emitted at DEBUG level
+_BANNER = "=" * 50
+
+# Classification labels; anything the classifier returns outside these is OFF_TOPIC
+MEDICAL = "MEDICAL"
+OFF_TOPIC = "OFF_TOPIC"
+VALID_RESULTS = frozenset({MEDICAL, OFF_TOPIC})
+
+# Cheap pre-classification so obvious messages skip the classification LLM call.
+# A bare greeting/thanks is OFF_TOPIC; two or more distinct medical terms is MEDICAL.
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+MEDICAL_KEYWORD_THRESHOLD = 2
+MEDICAL_KEYWORDS = frozenset(
+    {
+        # Care and general terms
+        "medical", "medicine", "medicines", "medication", "medications", "doctor",
+        "doctors", "physician", "clinic", "hospital", "symptom", "symptoms",
+        "diagnosis", "diagnosed", "treatment", "treatments", "therapy", "disease",
+        "diseases", "condition", "chronic", "prescription", "prescribed", "dose",
+        "dosage", "dosing", "vaccine", "vaccination", "surgery", "specialist",
+        # Labs and vitals
+        "blood", "cholesterol", "ldl", "hdl", "triglyceride", "triglycerides",
+        "glucose", "hba1c", "a1c", "insulin", "creatinine", "egfr", "urea",
+        "hemoglobin", "haemoglobin", "platelet", "platelets", "wbc", "rbc",
+        "thyroid", "tsh", "bilirubin", "albumin", "electrolytes", "sodium",
+        "potassium", "ferritin", "vitamin", "bmi", "lipid", "lipids", "bp",
+        "systolic", "diastolic", "pulse", "ecg", "ekg", "mri", "ct", "xray",
+        "ultrasound", "biopsy", "urine", "urinalysis", "mg", "dl", "mmol", "mmhg",
+        # Conditions
+        "diabetes", "diabetic", "prediabetes", "hypertension", "hypotension",
+        "anemia", "anaemia", "asthma", "cancer", "tumor", "tumour", "stroke",
+        "arthritis", "infection", "fever", "flu", "influenza", "covid", "allergy",
+        "allergies", "migraine", "depression", "anxiety", "obesity", "gout",
+        "hepatitis", "pneumonia", "eczema", "osteoporosis", "dementia",
+        "cardiovascular", "cardiac", "kidney", "renal", "liver", "hepatic",
+        "heart", "lung", "lungs",
+        # Symptoms
+        "pain", "ache", "headache", "nausea", "vomiting", "dizziness", "dizzy",
+        "fatigue", "cough", "rash", "swelling", "inflammation", "bleeding",
+        "palpitations", "insomnia", "diarrhea", "diarrhoea", "constipation",
+        # Medicines
+        "metformin", "statin", "statins", "atorvastatin", "aspirin", "ibuprofen",
+        "paracetamol", "acetaminophen", "antibiotic", "antibiotics", "amlodipine",
+        "lisinopril", "warfarin", "steroid", "steroids", "supplement", "supplements",
+    }
+)  # fmt: skip
+
+
+def pre_classify(text: str) -> Optional[str]:
+    """
+    Return "OFF_TOPIC" for bare greetings, "MEDICAL" for clearly medical text,
+    or None when the message is ambiguous and needs the LLM classifier.
+    """
+    if GREETING_RE.match(text):
+        return OFF_TOPIC
+
+    # Injection attempts are left to the classifier (which treats them as off-topic)
+    if detect_prompt_injection(text):
+        return None
+
+    tokens = set(TOKEN_RE.findall(text.lower()))
+    if len(tokens & MEDICAL_KEYWORDS) >= MEDICAL_KEYWORD_THRESHOLD:
+        return MEDICAL
+
+    return None
+
 
-def now():
-    return datetime.now(ZoneInfo("Asia/Singapore")).isoformat()
+def normalize_label(content: str) -> str:
+    """Map raw classifier output (e.g. ' "medical"\n') onto one of VALID_RESULTS."""
+    result = content.strip().strip('"').upper()
+    return result if result in VALID_RESULTS else OFF_TOPIC
+
+
+# Identical messages with identical context (e.g. repeated greetings) classify the same way.
+classification_cache = LLMResponseCache(
+    "orchestrator_classification",
+    maxsize=settings.LLM_CACHE_MAX_ENTRIES,
+    ttl=settings.LLM_CACHE_TTL_SECONDS,
+)
+
+
+# -----------------------------
+# TEXT ONLY = classify with LLM
+# -----------------------------
+async def _text_only(state):
+    logger.info("Has Text Only")
+
+    # Obvious medical questions go straight to QnA without any LLM call
+    result = pre_classify(state.input_text)
+    if result == MEDICAL:
+        logger.info("Orchestrator pre-classified message as MEDICAL")
+        return {"next_node": "qna", "last_updated": now()}
+
+    # Load classification prompt config from JSON
+    version = settings.PROMPT_VERSIONS.get(
+        "orchestrator", settings.DEFAULT_PROMPT_VERSION
+    )
+    classification_config = load_prompt_config(
+        module="orchestrator", key="classification", version=version
+    )
+
+    # langfuse prompt managment (START)
+    try:
+        classification_prompt = langfusePrompt.get_prompt(
+            "orchestrator/classificationSystemPrompt"
+        )
+        system_prompt = classification_prompt.compile()
+        config = classification_prompt.config
+        model = config.get("model", "gpt-4o-mini")
+        temperature = config.get("temperature", 0.2)
+        logger.info(
+            "Langfuse prompt fetched successfully: version %s",
+            classification_prompt.version,
+        )
+    except Exception:
+        # fallback to local prompt config if langfuse prompt retrieval fails
+        logger.info(
+            "Failed to load classification system prompt from Langfuse, falling back to local prompt config."
+        )
+        system_prompt = classification_config["system"]
+        model = classification_config["model"]
+        temperature = classification_config["temperature"]
+        classification_prompt = None
+    # langfuse prompt managment (END)
+
+    # Load off-topic response prompt config from JSON
+    response_config = load_prompt_config(
+        module="orchestrator", key="off_topic_response", version=version
+    )
+
+    # langfuse prompt managment (START)
+    try:
+        off_topic_prompt = langfusePrompt.get_prompt(
+            "orchestrator/offTopicSystemPrompt"
+        )
+        response_prompt = off_topic_prompt.compile()
+        config = off_topic_prompt.config
+        response_model = config.get("model", "gpt-4o-mini")
+        response_temperature = config.get("temperature", 0.7)
+        logger.info(
+            "Langfuse prompt fetched successfully: version %s",
+            off_topic_prompt.version,
+        )
+    except Exception:
+        # fallback to local prompt config if langfuse prompt retrieval fails
+        logger.info(
+            "Failed to load off topic system prompt from Langfuse, falling back to local prompt config."
+        )
+        response_prompt = response_config["system"]
+        response_model = response_config["model"]
+        response_temperature = response_config["temperature"]
+        off_topic_prompt = None
+    # langfuse prompt managment (END)
+
+    context = build_context(state)
+
+    logger.debug("Orchestrator build context:\n %s", context)
+
+    classification_llm = get_llm(model, temperature)
+    response_llm = get_llm(response_model, response_temperature)
+    classification_messages = [
+        SystemMessage(content=system_prompt),
+        HumanMessage(content=context),
+    ]
+    response_messages = [
+        SystemMessage(content=response_prompt),
+        HumanMessage(content=f"User message: '{state.input_text}'"),
+    ]
+
+    cache_key = LLMResponseCache.make_key(model, temperature, system_prompt, context)
+    contextual_result = None
+
+    if result is not None:
+        # Greeting: only the off-topic reply is needed
+        logger.info("Orchestrator pre-classified message as %s", result)
+    elif (result := classification_cache.get(cache_key)) is None:
+        # Classify and draft the off-topic reply concurrently; the draft is
+        # discarded when the message turns out to be medical, so a failed
+        # draft only matters (and is raised) for off-topic messages.
+        response, contextual_result = await asyncio.gather(
+            classification_llm.ainvoke(classification_messages),
+            response_llm.ainvoke(response_messages),
+            return_exceptions=True,
+        )
+        if isinstance(response, BaseException):
+            raise response
+
+        # Update langfuse monitoring w/o prompt management
+        langfuse.update_current_generation(
+            usage_details=response.response_metadata.get("token_usage"),
+            model=response.response_metadata.get("model_name"),
+            prompt=classification_prompt,
+        )
+
+        result = normalize_label(response.content)
+        classification_cache.set(cache_key, result)
+    else:
+        logger.info(
+            "Orchestrator classification served from cache (hit rate %.2f)",
+            classification_cache.stats()["hit_rate"],
+        )
+
+    logger.info("Orchestrator classification result: %s", result)
+
+    if result == OFF_TOPIC:
+        if contextual_result is None:
+            contextual_result = await response_llm.ainvoke(response_messages)
+        elif isinstance(contextual_result, BaseException):
+            raise contextual_result
+
+        # Update langfuse monitoring w/o prompt management
+        langfuse.update_current_generation(
+            usage_details=contextual_result.response_metadata.get("token_usage"),
+            model=contextual_result.response_metadata.get("model_name"),
+            prompt=off_topic_prompt,
+        )
+
+        contextual_response = contextual_result.content.strip()
+
+        logger.info("Generated off-topic response: %s", contextual_response)
+        logger.debug(_BANNER)
+
+        return {
+            "pre_compliance_response": contextual_response,
+            "next_node": "compliance",
+            "last_updated": now(),
+        }
+
+    # Medical = route to QnA
+    logger.debug(_BANNER)
+    return {"next_node": "qna", "last_updated": now()}
+
+
+def find_prior_analysis(state) -> Optional[dict]:
+    """
+    Return the session's earlier analysis of the same PDF (matched by content
+    hash), if it went through the full medical pipeline.
+    """
+    content_hash = (state.file_meta or {}).get("content_hash")
+    if not content_hash:
+        return None
+
+    for entry in reversed(getattr(state, "analysis", None) or []):
+        if (
+            entry.get("content_hash") == content_hash
+            and entry.get("risk_assessment")
+            and entry.get("insights_summary")
+        ):
+            return entry
+
+    return None
+
+
+def reuse_prior_analysis(state, prior: dict) -> dict:
+    """State updates that replay a prior analysis instead of re-running the pipeline."""
+    return {
+        "clinical_analysis": prior["clinical_analysis"],
+        "risk_assessment": prior["risk_assessment"],
+        "insights_summary": prior["insights_summary"],
+        # The re-uploaded document becomes the latest one in the context
+        "analysis": [entry for entry in state.analysis if entry is not prior] + [prior],
+        "file_bytes": None,
+    }
+
+
+# -----------------------------
+# FILE ONLY = document pipeline
+# -----------------------------
+async def _file_only(state):
+    logger.info("Has File Only")
+
+    prior = find_prior_analysis(state)
+    if prior:
+        logger.info("Document already analysed in this session. Reusing insights.")
+        return {
+            **reuse_prior_analysis(state, prior),
+            "pre_compliance_response": prior["insights_summary"],
+            "next_node": "compliance",
+            "last_updated": now(),
+        }
+
+    return {"next_node": "doc_pipeline", "last_updated": now()}
+
+
+# -----------------------------
+# BOTH FILE + TEXT = doc pipeline first, then QnA
+# -----------------------------
+async def _file_and_text(state):
+    logger.info("Has File and Text")
+
+    prior = find_prior_analysis(state)
+    if prior:
+        logger.info("Document already analysed in this session. Routing to QnA.")
+        return {
+            **reuse_prior_analysis(state, prior),
+            "next_node": "qna",
+            "last_updated": now(),
+        }
+
+    logger.debug(_BANNER)
+    return {"next_node": "doc_then_qna", "last_updated": now()}
+
+
+# Fallback
+async def _no_input(state):
+    return {
+        "next_node": "compliance",
+        "final_response": "An error has occurred. Please try again later.",
+        "last_updated": now(),
+    }
+
+
+# Dispatch on (has_text << 1) | has_file
+HANDLERS = {
+    0b00: _no_input,
+    0b01: _file_only,
+    0b10: _text_only,
+    0b11: _file_and_text,
+}
 
 
 @observe(as_type="span")
-def orchestrator_node(state):
+async def orchestrator_node(state):
     """
     This is the routing brain.
     It uses an LLM to classify text-only messages as medical or off-topic.
     It returns a dict of updates (LangGraph merges them into State).
     """
-    logger.info(f"Langfuse host: '{settings.LANGFUSE_BASE_URL}'")
+    logger.info("Langfuse host: '%s'", settings.LANGFUSE_BASE_URL)
 
     # Add langfuse session tracking
     with propagate_attributes(
@@ -42,150 +362,5 @@ def orchestrator_node(state):
         user_id=state.session_id,
         trace_name="orchestrator",
     ):
-        has_text = bool(state.input_text)
-        has_file = bool(state.file_meta)
-
-        # -----------------------------
-        # TEXT ONLY = classify with LLM
-        # -----------------------------
-        if has_text and not has_file:
-            logger.info("Has Text Only")
-
-            # Load classification prompt config from JSON
-            version = settings.PROMPT_VERSIONS.get(
-                "orchestrator", settings.DEFAULT_PROMPT_VERSION
-            )
-            classification_config = load_prompt_config(
-                module="orchestrator", key="classification", version=version
-            )
-
-            # langfuse prompt managment (START)
-            try:
-                classification_prompt = langfusePrompt.get_prompt(
-                    "orchestrator/classificationSystemPrompt"
-                )
-                system_prompt = classification_prompt.compile()
-                config = classification_prompt.config
-                model = config.get("model", "gpt-4o-mini")
-                temperature = config.get("temperature", 0.2)
-                logger.info(
-                    f"Langfuse prompt fetched successfully: version {classification_prompt.version}"
-                )
-            except Exception:
-                # fallback to local prompt config if langfuse prompt retrieval fails
-                logger.info(
-                    "Failed to load classification system prompt from Langfuse, falling back to local prompt config."
-                )
-                system_prompt = classification_config["system"]
-                model = classification_config["model"]
-                temperature = classification_config["temperature"]
-                classification_prompt = None
-            # langfuse prompt managment (END)
-
-            context = build_context(state)
-
-            logger.info("Orchestrator build context:\n %s", context)
-
-            # Call LLM for classification with config from prompts.json
-            llm = ChatOpenAI(model=model, temperature=temperature)
-            response = llm.invoke(
-                [SystemMessage(content=system_prompt), HumanMessage(content=context)]
-            )
-
-            # Update langfuse monitoring w/o prompt management
-            langfuse.update_current_generation(
-                usage_details=response.response_metadata.get("token_usage"),
-                model=response.response_metadata.get("model_name"),
-                prompt=classification_prompt,
-            )
-
-            result = response.content.strip().upper()
-
-            logger.info("Orchestrator classification result: %s", result)
-
-            if result == "OFF_TOPIC":
-                # Load off-topic response prompt config from JSON
-                response_config = load_prompt_config(
-                    module="orchestrator", key="off_topic_response", version=version
-                )
-
-                # langfuse prompt managment (START)
-                try:
-                    off_topic_prompt = langfusePrompt.get_prompt(
-                        "orchestrator/offTopicSystemPrompt"
-                    )
-                    response_prompt = off_topic_prompt.compile()
-                    config = off_topic_prompt.config
-                    response_model = config.get("model", "gpt-4o-mini")
-                    response_temperature = config.get("temperature", 0.7)
-                    logger.info(
-                        f"Langfuse prompt fetched successfully: version {off_topic_prompt.version}"
-                    )
-                except Exception:
-                    # fallback to local prompt config if langfuse prompt retrieval fails
-                    logger.info(
-                        "Failed to load off topic system prompt from Langfuse, falling back to local prompt config."
-                    )
-                    response_prompt = response_config["system"]
-                    response_model = response_config["model"]
-                    response_temperature = response_config["temperature"]
-                    off_topic_prompt = None
-                # langfuse prompt managment (END)
-
-                llm_response = ChatOpenAI(
-                    model=response_model, temperature=response_temperature
-                )
-                contextual_result = llm_response.invoke(
-                    [
-                        SystemMessage(content=response_prompt),
-                        HumanMessage(content=f"User message: '{state.input_text}'"),
-                    ]
-                )
-
-                # Update langfuse monitoring w/o prompt management
-                langfuse.update_current_generation(
-                    usage_details=contextual_result.response_metadata.get(
-                        "token_usage"
-                    ),
-                    model=contextual_result.response_metadata.get("model_name"),
-                    prompt=off_topic_prompt,
-                )
-
-                contextual_response = contextual_result.content.strip()
-
-                logger.info("Generated off-topic response: %s", contextual_response)
-                print("=" * 50 + "\n")
-
-                return {
-                    "pre_compliance_response": contextual_response,
-                    "next_node": "compliance",
-                    "last_updated": now(),
-                }
-
-            # Medical = route to QnA
-            print("=" * 50 + "\n")
-            return {"next_node": "qna", "last_updated": now()}
-
-        # -----------------------------
-        # FILE ONLY = document pipeline
-        # -----------------------------
-        if has_file and not has_text:
-            logger.info("Has File Only")
-
-            return {"next_node": "doc_pipeline", "last_updated": now()}
-
-        # -----------------------------
-        # BOTH FILE + TEXT = doc pipeline first, then QnA
-        # -----------------------------
-        if has_file and has_text:
-            logger.info("Has File and Text")
-
-            print("=" * 50 + "\n")
-            return {"next_node": "doc_then_qna", "last_updated": now()}
-
-        # Fallback
-        return {
-            "next_node": "compliance",
-            "final_response": "An error has occurred. Please try again later.",
-            "last_updated": now(),
-        }
+        key = (bool(state.input_text) << 1) | bool(state.file_meta)
+        return await HANDLERS[key](state)
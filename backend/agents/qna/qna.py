@@ -1,16 +1,19 @@
 import logging
-import re
-from datetime import datetime
-from zoneinfo import ZoneInfo
 
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
 from langfuse import Langfuse, get_client, observe, propagate_attributes
 
 from config.settings import settings
+from core.clock import now
 from core.context_builder import build_context
+from core.llm_clients import get_llm
 from core.prompt_loader import load_prompt_config
+from core.text_checks import (
+    detect_medical_output_risk,
+    detect_prompt_injection,
+    sanitize_user_input,
+)
 
 load_dotenv()
 
@@ -27,74 +30,8 @@ langfuse = get_client()
 # user input -> prompt injection detection -> input sanitization -> update state.input_text-> context building -> llm call -> response
 
 
-def now():
-    return datetime.now(ZoneInfo("Asia/Singapore")).isoformat()
-
-
-# Prompt injection detection
-def detect_prompt_injection(user_input: str) -> bool:
-    suspicious_patterns = [
-        "ignore previous instructions",
-        "reveal system prompt",
-        "developer mode",
-        "system prompt",
-        "bypass filters",
-        "jailbreak",
-    ]
-    lower_input = user_input.lower()
-    for pattern in suspicious_patterns:
-        if pattern in lower_input:
-            logger.warning(
-                f"Potential prompt injection detected: '{pattern}' found in user input."
-            )
-            return True
-
-    return False
-
-
-# Sanitization to remove potentially harmful content
-def sanitize_user_input(user_input: str) -> str:
-    patterns = [
-        r"ignore previous instructions",
-        r"reveal system prompt",
-        r"developer mode",
-        r"system prompt",
-        r"bypass filters",
-        r"jailbreak",
-    ]
-
-    # Basic sanitization to remove potentially harmful content
-    sanitized = user_input
-    for pattern in patterns:
-        sanitized = re.sub(pattern, "", sanitized, flags=re.IGNORECASE)
-    return sanitized
-
-
-# Additional check for medical advice in output
-def detect_medical_output_risk(output: str) -> bool:
-    risky_keywords = [
-        "take .* mg",
-        "dosage",
-        "prescribe",
-        "stop taking",
-        "start taking",
-        "you should take",
-        "diagnose",
-        "treatment plan",
-    ]
-
-    for keyword in risky_keywords:
-        if re.search(keyword, output, re.IGNORECASE):
-            logger.warning(
-                f"Potential medical advice detected in output: '{keyword}' found."
-            )
-            return True
-
-    return False
-
-
 @observe(as_type="generation")
-def qna_node(state):
+async def qna_node(state):
     """
     Health and Medical Q&A Assistant
     """
@@ -167,8 +104,8 @@ def qna_node(state):
 
         # Call LLM with config from prompts.json
         # Injects retrived context and user questions into the LLM prompt to enable grounded answering with optional to fallback to general knowledge
-        llm = ChatOpenAI(model=model, temperature=temperature)
-        response = llm.invoke(
+        llm = get_llm(model, temperature)
+        response = await llm.ainvoke(
             [
                 SystemMessage(content=system_prompt),
                 HumanMessage(
@@ -1,15 +1,23 @@
-import json
 import logging
-from datetime import datetime
 from typing import Optional
-from zoneinfo import ZoneInfo
 
-from fastapi import APIRouter, File, Form, Header, Request, UploadFile
+import msgspec
+import orjson
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    File,
+    Form,
+    Header,
+    Request,
+    UploadFile,
+)
 from fastapi.responses import StreamingResponse
 from langgraph.graph import END, START, StateGraph
 
 from agents.compliance.compliance import compliance_node
 from agents.document_processing.agent.clinical_analysis import clinical_analysis_node
+from agents.document_processing.agent.combined_analysis import combined_analysis_node
 from agents.document_processing.agent.insights_summary import insights_summary_node
 from agents.document_processing.agent.risk_assessment import risk_assessment_node
 from agents.document_processing.document_parser import document_parser_node
@@ -18,6 +26,8 @@ from agents.guardrail.input_guardrail import input_guardrail_node
 from agents.orchestrator import orchestrator
 from agents.qna.qna import qna_node
 from app.graph_state import State
+from core import clock
+from core.context_builder import INPUT_SNIPPET_MAX, RESPONSE_SNIPPET_MAX
 
 logger = logging.getLogger("chat")
 router = APIRouter()
@@ -28,6 +38,7 @@ NODE_STATUS_PUBLIC = {
     "document_parser": "We’re reading your document...",
     "pii_removal": "Protecting your sensitive information...",
     "clinical_analysis": "Analyzing your health information...",
+    "combined_analysis": "Analyzing your health information...",
     "risk_assessment": "Looking for important health insights...",
     "insights_summary": "Summarizing key findings...",
     "qna": "Answering your question...",
@@ -37,24 +48,31 @@ NODE_STATUS_PUBLIC = {
 
 # Helper to format SSE messages
 def sse_event(data: dict) -> str:
-    return f"data: {json.dumps(data)}\n\n"
+    return f"data: {orjson.dumps(data).decode()}\n\n"
 
 
 @router.post("/chat")
 async def chat(
     request: Request,
+    background_tasks: BackgroundTasks,
     message: Optional[str] = Form(None, description="User's text message"),
     file: Optional[UploadFile] = File(None, description="Optional file upload"),
     x_session_id: Optional[str] = Header(None),
 ):
     # Get managers from app state
     session_manager = request.app.state.session_manager
-    logger.info(f"Session from header: {x_session_id}")
+    logger.info("Session from header: %s", x_session_id)
     # Get session data and set session id in response header
     session_data = await session_manager.get_or_create_session(x_session_id)
-    current_session_id = session_data["session_id"]
-
-    logger.info(f"Session data:\n{json.dumps(session_data, indent=2)}")
+    current_session_id = session_data.session_id
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Session data:\n%s",
+            orjson.dumps(
+                msgspec.to_builtins(session_data), option=orjson.OPT_INDENT_2
+            ).decode(),
+        )
 
     # Build graph once and store in app.state
     graph = request.app.state.graph
@@ -64,10 +82,30 @@ async def chat(
         session_data=session_data,
         input_text=message,
         file=file,
-        conversation_history=session_data["conversation_history"] or [],
-        analysis=session_data["analysis"] or [],
+        conversation_history=session_data.conversation_history,
+        analysis=session_data.analysis,
     )
 
+    # -------------------------------------------------------
+    # Session persistence — runs as a background task once the
+    # final SSE event has been sent
+    # -------------------------------------------------------
+    async def persist_session(final_state: dict):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Final session state:\n%s",
+                orjson.dumps(
+                    msgspec.to_builtins(session_data), option=orjson.OPT_INDENT_2
+                ).decode(),
+            )
+            logger.debug(
+                "Response state from graph:\n%s",
+                orjson.dumps(
+                    final_state, option=orjson.OPT_INDENT_2, default=str
+                ).decode(),
+            )
+        await session_manager.save_session(current_session_id, session_data)
+
     # -------------------------------------------------------
     # SSE Generator — streams node status + final response
     # -------------------------------------------------------
@@ -82,18 +120,18 @@ async def chat(
                 # Node started
                 if event_type == "on_chain_start" and node_name in NODE_STATUS_PUBLIC:
                     msg = NODE_STATUS_PUBLIC[node_name]
-                    logger.info(f"NODE STARTED: {node_name}")
+                    logger.info("NODE STARTED: %s", node_name)
                     yield sse_event({"type": "status", "message": msg})
 
                 elif event_type == "on_chain_end" and node_name in NODE_STATUS_PUBLIC:
-                    logger.info(f"NODE COMPLETED: {node_name}")
+                    logger.info("NODE COMPLETED: %s", node_name)
 
                 # Top-level chain done
                 elif event_type == "on_chain_end" and node_name == "LangGraph":
                     final_state = event["data"].get("output", {})
 
         except Exception as e:
-            logger.error(f"Pipeline error: {e}", exc_info=True)
+            logger.error("Pipeline error: %s", e, exc_info=True)
             yield sse_event(
                 {
                     "type": "error",
@@ -107,16 +145,16 @@ async def chat(
             return
 
         # --------------------------------------------------
-        # Persist session after pipeline completes
+        # Update session after pipeline completes
         # --------------------------------------------------
-        now = datetime.now(ZoneInfo("Asia/Singapore")).isoformat()
+        now = clock.now()
 
-        session_data["last_active"] = now
-        session_data["message_count"] += 1 if message else 0
-        session_data["upload_count"] += 1 if file else 0
+        session_data.last_active = clock.epoch()
+        session_data.message_count += 1 if message else 0
+        session_data.upload_count += 1 if file else 0
 
         if final_state.get("file_meta"):
-            session_data["upload_history"].append(
+            session_data.upload_history.append(
                 {
                     "filename": final_state.get("file_meta")["filename"],
                     "content_type": final_state.get("file_meta")["content_type"],
@@ -126,38 +164,46 @@ async def chat(
             )
 
         if final_state.get("clinical_analysis"):
+            content_hash = final_state.get("file_meta").get("content_hash")
             analysis_entry = {
                 "filename": final_state.get("file_meta")["filename"],
                 "uploaded_at": now,
+                "content_hash": content_hash,
                 "clinical_analysis": final_state.get("clinical_analysis", ""),
                 "risk_assessment": final_state.get("risk_assessment", ""),
+                "insights_summary": final_state.get("insights_summary", ""),
             }
-            session_data["analysis"].append(analysis_entry)
-
-        session_data["conversation_history"].append(
+            # A re-uploaded document replaces its earlier entry and becomes the latest
+            if content_hash:
+                session_data.analysis = [
+                    entry
+                    for entry in session_data.analysis
+                    if entry.get("content_hash") != content_hash
+                ]
+            session_data.analysis.append(analysis_entry)
+
+        # Snippets are truncated here, once, and rendered as-is into later contexts
+        response_text = final_state.get("final_response") or ""
+        session_data.conversation_history.append(
             {
                 "timestamp": now,
-                "input_text_snippet": (message or "")[:200],
-                "response_snippet": (final_state.get("final_response") or "")[:400],
+                "input_text_snippet": (message or "")[:INPUT_SNIPPET_MAX],
+                "response_snippet": response_text[:RESPONSE_SNIPPET_MAX],
             }
         )
 
-        logger.info(f"Final session state:\n{json.dumps(session_data, indent=2)}")
-        await session_manager.save_session(current_session_id, session_data)
+        # Remove internal fields before logging
+        final_state.pop("file_bytes", None)
+        final_state.pop("parsed_pages", None)
+
+        # Save (and log) after the response is sent; the client doesn't wait on Redis
+        background_tasks.add_task(persist_session, final_state)
 
         # --------------------------------------------------
         # Emit final response to client
         # --------------------------------------------------
         message_text = final_state.get("final_response") or "No response generated."
 
-        # Remove internal fields before logging
-        final_state.pop("file_bytes", None)
-        final_state.pop("parsed_text", None)
-        logger.info(
-            "Response state from graph:\n%s",
-            json.dumps(final_state, indent=2, default=str),
-        )
-
         yield sse_event(
             {
                 "type": "complete",
@@ -170,6 +216,7 @@ async def chat(
     return StreamingResponse(
         pipeline_stream(),
         media_type="text/event-stream",
+        background=background_tasks,
         headers={
             "X-Session-ID": current_session_id,
             "Cache-Control": "no-cache",
@@ -185,14 +232,158 @@ async def health_check():
     return {"status": "ok", "service": "Health Insights AI"}
 
 
+# ============================================
+# Graph routing functions
+# Defined once at module level and shared by every compiled graph
+# ============================================
+def response_ready(state: State) -> bool:
+    """
+    True once a node has already set the user-facing reply (errors, limit and
+    off-topic messages). Compliance skips these anyway, so route straight to END.
+    """
+    return bool(state.final_response)
+
+
+def route_from_input_guardrail(state: State) -> str:
+    """
+    Perform checks on the input and determine next node.
+    """
+    next_node = state.next_node
+
+    if next_node == "orchestrator":
+        return "orchestrator"
+    else:
+        return "END"
+
+
+def route_from_orchestrator(state: State) -> str:
+    """
+    Determine initial route based on input.
+    Routes:
+    - "doc_pipeline" -> File only OR File + Text
+    - "qna" -> Text only, or File + Text for an already analysed document
+    - "compliance" -> Off-topic text, or File only for an already analysed document
+    """
+    next_node = state.next_node
+
+    if response_ready(state):
+        return "END"
+    elif next_node == "doc_pipeline" or next_node == "doc_then_qna":
+        return "document_parser"
+    elif next_node == "qna":
+        return "qna"
+    else:
+        # Fallback - shouldn't happen
+        return "compliance"
+
+
+def route_from_document_parser(state: State) -> str:
+    """
+    Determine route after document parsing.
+    Routes:
+    - No issue parsing document -> Go to PII Removal
+    - Issue -> END with error message
+    """
+    next_node = state.next_node
+
+    if response_ready(state):
+        return "END"
+    elif next_node == "pii_removal":
+        return "pii_removal"
+    else:
+        # Fallback - shouldn't happen
+        return "compliance"
+
+
+def route_from_pii_removal(state: State) -> str:
+    """
+    Determine route after PII removal.
+    Routes:
+    - File only -> clinical_analysis
+    - File + Text -> combined_analysis (clinical analysis and QnA in one LLM call)
+    - Issue -> compliance with error message
+    """
+    next_node = state.next_node
+
+    if response_ready(state):
+        return "END"
+    elif next_node == "clinical_analysis" and state.input_text:
+        return "combined_analysis"
+    elif next_node == "clinical_analysis":
+        return "clinical_analysis"
+    else:
+        # Fallback - shouldn't happen
+        return "compliance"
+
+
+def route_from_clinical_analysis(state: State) -> str:
+    """
+    Determine route after clinical analysis.
+    Routes:
+    - if medical related -> route to risk_assessment
+    - if not medical related + No input text -> END with the fixed reply (skip risk assessment)
+    - if not medical related + Has input text -> route to QnA (skip risk assessment)
+    """
+    next_node = state.next_node
+
+    if response_ready(state):
+        return "END"
+    elif next_node == "risk_assessment":
+        return "risk_assessment"
+    elif next_node == "compliance":
+        return "compliance"
+    elif next_node == "qna":
+        return "qna"
+    else:
+        # Fallback - shouldn't happen
+        return "compliance"
+
+
+def route_after_insights(state: State) -> str:
+    """
+    After document analysis:
+    - If user asked a question (file + text) not yet answered → Go to QnA
+    - If file only, or question answered by combined_analysis → Go straight to compliance
+    """
+    next_node = state.next_node
+
+    if response_ready(state):
+        return "END"
+    # If user uploaded file + asked a question
+    elif next_node == "qna":
+        return "qna"
+    else:
+        # File only - go straight to compliance
+        return "compliance"
+
+
+def route_from_risk_assessment(state: State) -> str:
+    """
+    Risk assessment goes to Insights Summary unless it failed with an error reply.
+    """
+    if response_ready(state):
+        return "END"
+    return "insights_summary"
+
+
+def route_from_qna(state: State) -> str:
+    """
+    QnA answers go to compliance unless QnA failed with an error reply.
+    """
+    if response_ready(state):
+        return "END"
+    return "compliance"
+
+
 def build_graph():
     """
     Build the orchestrator graph with 3 routing scenarios:
     1. Input Text only -> Input Guardrail -> Orchestrator agent -> QnA agent  → Compliance agent  -> END
     2a. File only -> Input Guardrail -> Orchestrator agent -> Document Parser service -> PII Removal service -> Clinical agent (Health/Medical Related) -> Risk agent -> Insights Summary agent -> Compliance agent -> END
     2b. File only -> Input Guardrail -> Orchestrator agent -> Document Parser service -> PII Removal service -> Clinical agent (Non-Health/Medical Related) -> QnA agent -> Compliance agent -> END
-    3a. File + Input Text -> Input Guardrail -> Orchestrator agent -> Document Parser service -> PII Removal service -> Clinical agent (Health/Medical Related) -> Risk agent -> Insights Summary agent -> QnA agent -> Compliance agent -> END
-    3b. File + Input Text -> Input Guardrail -> Orchestrator agent -> Document Parser service -> PII Removal service -> Clinical agent (Non-Health/Medical Related) -> QnA agent -> Compliance agent -> END
+    3a. File + Input Text -> Input Guardrail -> Orchestrator agent -> Document Parser service -> PII Removal service -> Combined Clinical + QnA agent (Health/Medical Related) -> Risk agent -> Insights Summary agent -> Compliance agent -> END
+    3b. File + Input Text -> Input Guardrail -> Orchestrator agent -> Document Parser service -> PII Removal service -> Combined Clinical + QnA agent (Non-Health/Medical Related) -> Compliance agent -> END
+    Any node that has already set final_response (errors, non-health document without text) routes straight to END.
     """
 
     builder = StateGraph(State)
@@ -203,6 +394,7 @@ def build_graph():
     builder.add_node("document_parser", document_parser_node)
     builder.add_node("pii_removal", pii_removal_node)
     builder.add_node("clinical_analysis", clinical_analysis_node)
+    builder.add_node("combined_analysis", combined_analysis_node)
     builder.add_node("risk_assessment", risk_assessment_node)
     builder.add_node("insights_summary", insights_summary_node)
     builder.add_node("qna", qna_node)
@@ -214,18 +406,6 @@ def build_graph():
     # ============================================
     # Conditional routing from input guardrail
     # ============================================
-
-    def route_from_input_guardrail(state: State) -> str:
-        """
-        Perform checks on the input and determine next node.
-        """
-        next_node = state.next_node
-
-        if next_node == "orchestrator":
-            return "orchestrator"
-        else:
-            return "END"
-
     builder.add_conditional_edges(
         "input_guardrail",
         route_from_input_guardrail,
@@ -235,23 +415,6 @@ def build_graph():
     # ============================================
     # Conditional routing from orchestrator
     # ============================================
-    def route_from_orchestrator(state: State) -> str:
-        """
-        Determine initial route based on input.
-        Routes:
-        - "doc_pipeline" -> File only OR File + Text
-        - "qna" -> Text only
-        """
-        next_node = state.next_node
-
-        if next_node == "doc_pipeline" or next_node == "doc_then_qna":
-            return "document_parser"
-        elif next_node == "qna":
-            return "qna"
-        else:
-            # Fallback - shouldn't happen
-            return "compliance"
-
     builder.add_conditional_edges(
         "orchestrator",
         route_from_orchestrator,
@@ -259,58 +422,36 @@ def build_graph():
             "document_parser": "document_parser",
             "qna": "qna",
             "compliance": "compliance",
+            "END": END,
         },
     )
 
     # ============================================
     # Conditional routing from Document Parser
     # ============================================
-    def route_from_document_parser(state: State) -> str:
-        """
-        Determine route after document parsing.
-        Routes:
-        - No issue parsing document -> Go to PII Removal
-        - Issue -> END with error message
-        """
-        next_node = state.next_node
-
-        if next_node == "pii_removal":
-            return "pii_removal"
-        else:
-            # Fallback - shouldn't happen
-            return "compliance"
-
     builder.add_conditional_edges(
         "document_parser",
         route_from_document_parser,
-        {"pii_removal": "pii_removal", "compliance": "compliance"},
+        {"pii_removal": "pii_removal", "compliance": "compliance", "END": END},
     )
 
-    builder.add_edge("pii_removal", "clinical_analysis")
+    # ============================================
+    # Conditional routing from PII Removal
+    # ============================================
+    builder.add_conditional_edges(
+        "pii_removal",
+        route_from_pii_removal,
+        {
+            "clinical_analysis": "clinical_analysis",
+            "combined_analysis": "combined_analysis",
+            "compliance": "compliance",
+            "END": END,
+        },
+    )
 
     # ============================================
     # Conditional routing from clinical_analysis
     # ============================================
-    def route_from_clinical_analysis(state: State) -> str:
-        """
-        Determine route after clinical analysis.
-        Routes:
-        - if medical related -> route to risk_assessment
-        - if not medical related + No input text -> route to compliance (skip risk assessment)
-        - if not medical related + Has input text -> route to QnA (skip risk assessment)
-        """
-        next_node = state.next_node
-
-        if next_node == "risk_assessment":
-            return "risk_assessment"
-        elif next_node == "compliance":
-            return "compliance"
-        elif next_node == "qna":
-            return "qna"
-        else:
-            # Fallback - shouldn't happen
-            return "compliance"
-
     builder.add_conditional_edges(
         "clinical_analysis",
         route_from_clinical_analysis,
@@ -318,6 +459,19 @@ def build_graph():
             "risk_assessment": "risk_assessment",
             "compliance": "compliance",
             "qna": "qna",
+            "END": END,
+        },
+    )
+
+    # Combined analysis routes the same way (risk_assessment or compliance)
+    builder.add_conditional_edges(
+        "combined_analysis",
+        route_from_clinical_analysis,
+        {
+            "risk_assessment": "risk_assessment",
+            "compliance": "compliance",
+            "qna": "qna",
+            "END": END,
         },
     )
 
@@ -325,36 +479,29 @@ def build_graph():
     # Conditional routing from Insight Summary
     # Check if we need QnA agent to answer user question based on analysis, or if we can skip straight to compliance.
     # ============================================
-    def route_after_insights(state: State) -> str:
-        """
-        After document analysis:
-        - If user asked a question (file + text) → Go to QnA
-        - If file only → Go straight to compliance
-        """
-        next_node = state.next_node
-
-        # If user uploaded file + asked a question
-        if next_node == "qna":
-            return "qna"
-        else:
-            # File only - go straight to compliance
-            return "compliance"
-
     builder.add_conditional_edges(
         "insights_summary",
         route_after_insights,
-        {"qna": "qna", "compliance": "compliance"},
+        {"qna": "qna", "compliance": "compliance", "END": END},
     )
 
     # ============================================
-    # Risk Assessment always goes to Insights Summary
+    # Risk Assessment goes to Insights Summary (END on error)
     # ============================================
-    builder.add_edge("risk_assessment", "insights_summary")
+    builder.add_conditional_edges(
+        "risk_assessment",
+        route_from_risk_assessment,
+        {"insights_summary": "insights_summary", "END": END},
+    )
 
     # ============================================
-    # QnA always goes to compliance
+    # QnA goes to compliance (END on error)
     # ============================================
-    builder.add_edge("qna", "compliance")
+    builder.add_conditional_edges(
+        "qna",
+        route_from_qna,
+        {"compliance": "compliance", "END": END},
+    )
 
     # ============================================
     # Compliance is the final node before END
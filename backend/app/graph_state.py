@@ -1,16 +1,17 @@
-from datetime import datetime
+from dataclasses import dataclass, field
 from typing import Any, Dict, Optional
-from zoneinfo import ZoneInfo
 
-from pydantic import BaseModel
+from core.clock import now
+from core.session import Session
 
 
-class State(BaseModel):
+# A plain slotted dataclass: LangGraph merges node updates without running
+# pydantic validation on every hop, and each instance gets its own timestamps.
+@dataclass(slots=True)
+class State:
     # Core session info
     session_id: str
-    session_data: Optional[Dict[str, Any]] = (
-        None  # Store any session-specific data here
-    )
+    session_data: Optional[Session] = None  # Store any session-specific data here
     input_text: Optional[str] = None
     file_meta: Optional[Dict[str, Any]] = None
     file_bytes: Optional[bytes] = None
@@ -33,7 +34,7 @@ class State(BaseModel):
     )
 
     # Document processing outputs
-    parsed_text: Optional[str] = None  # before PII removal
+    parsed_pages: Optional[list] = None  # per-page markdown before PII removal
     sanitized_text: Optional[str] = None  # after PII removal
     clinical_analysis: Optional[str] = None  # summary of findings
     risk_assessment: Optional[str] = None  # list of risk flags
@@ -51,5 +52,5 @@ class State(BaseModel):
     # Final response (after compliance check and any modifications)
     final_response: Optional[str] = None
 
-    created_at: str = datetime.now(ZoneInfo("Asia/Singapore")).isoformat()
-    last_updated: str = datetime.now(ZoneInfo("Asia/Singapore")).isoformat()
+    created_at: str = field(default_factory=now)
+    last_updated: str = field(default_factory=now)
@@ -35,6 +35,10 @@ class Settings(BaseSettings):
     REDIS_URL: str = "redis://localhost:6379"
     SESSION_TTL_SECONDS: int = 1_800  # default 30 minutes for Redis sessions
 
+    # In-process cache for repeated LLM classifications/analyses
+    LLM_CACHE_TTL_SECONDS: int = 3_600
+    LLM_CACHE_MAX_ENTRIES: int = 512
+
     FRONTEND_ORIGINS: List[str] = ["http://localhost:3000"]
 
     # ---------------------------------------------------------------
@@ -44,6 +48,7 @@ class Settings(BaseSettings):
         "input_guardrail": "v1.0",
         "orchestrator": "v1.0",
         "clinical_analysis": "v1.0",
+        "combined_analysis": "v1.0",
         "risk_assessment": "v1.0",
         "qna": "v1.0",
         "compliance": "v1.0",
@@ -0,0 +1,16 @@
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+# All timestamps in the app are Singapore time; resolve the zone once
+SGT = ZoneInfo("Asia/Singapore")
+
+
+def now() -> str:
+    """Current Singapore time as an ISO-8601 string."""
+    return datetime.now(SGT).isoformat()
+
+
+def epoch() -> int:
+    """Current Unix time in whole seconds (for compact stored timestamps)."""
+    return int(time.time())
@@ -1,9 +1,11 @@
 # Compute relavance by counting overlapped keywords between the query and text
 def filter_relevant_context(chunks, query, top_k=3, min_score=1):
+    # The query's keywords are the same for every chunk, so split them once
+    query_keywords = set(query.lower().split())
     scored_chunks = []
 
     for chunk in chunks:
-        relevance_score = keyword_overlap_score(chunk, query)
+        relevance_score = keyword_overlap_score(chunk, query_keywords)
         if relevance_score >= min_score:
             scored_chunks.append((relevance_score, chunk))
 
@@ -13,49 +15,70 @@ def filter_relevant_context(chunks, query, top_k=3, min_score=1):
 
 
 # Select the Top-K most relevant chunks based on keyword overlap with the query
-def keyword_overlap_score(text, query):
-    query_keywords = set(query.lower().split())
-    text_keywords = set(text.lower().split())
+def keyword_overlap_score(text, query_keywords):
+    return len(query_keywords.intersection(text.lower().split()))
+
+
+# Number of past turns included in the LLM context
+CONTEXT_TURNS = 5
 
-    return len(query_keywords & text_keywords)
+# Turn snippets are truncated once when the chat route records the turn, so
+# rendering below uses them as-is
+INPUT_SNIPPET_MAX = 200
+RESPONSE_SNIPPET_MAX = 400
+
+# Section templates, parsed once at import and filled with str.format per call
+TURN_TEMPLATE = "  Turn {number}:\n    User: {user}\n    Assistant: {assistant}"
+ANALYSIS_TEMPLATE = (
+    "PREVIOUS DOCUMENT ANALYSIS: {filename}\n"
+    "  • Clinical Findings: {findings}\n"
+    "  • Risk Flags: {risk_flags}"
+)
+MESSAGE_TEMPLATE = 'NEW MESSAGE FROM USER:\n  "{message}"'
 
 
 def build_context(state) -> str:
     """
     Build structured context for LLM using past conversation history, analysis, and current input.
+    Always returns a str ("" when there is nothing to include), so callers can concatenate directly.
     """
+    # One entry per section; sections are the unit the relevance filter scores
     context_parts = []
+    add_part = context_parts.append
 
     # 1. Past conversation with turn numbers and clear role distinction
     conversation = getattr(state, "conversation_history", None)
     if conversation:
-        recent = conversation[-5:]
-        conv_text = []
-        for i, msg in enumerate(recent, 1):
-            conv_text.append(f"  Turn {i}:")
-            conv_text.append(f"    User: {msg.get('input_text_snippet', '')}")
-            conv_text.append(f"    Assistant: {msg.get('response_snippet', '')}")
-        context_parts.append("CONVERSATION HISTORY:\n" + "\n".join(conv_text))
+        add_part(
+            "CONVERSATION HISTORY:\n"
+            + "\n".join(
+                TURN_TEMPLATE.format(
+                    number=number,
+                    user=msg.get("input_text_snippet", ""),
+                    assistant=msg.get("response_snippet", ""),
+                )
+                for number, msg in enumerate(conversation[-CONTEXT_TURNS:], 1)
+            )
+        )
 
     # 2. Past analysis with structured sections
     analysis = getattr(state, "analysis", None)
     if analysis:
         latest = analysis[-1]
-        analysis_lines = [
-            f"PREVIOUS DOCUMENT ANALYSIS: {latest.get('filename', '')}",
-            f"  • Clinical Findings: {latest.get('clinical_analysis', '')}",
-            f"  • Risk Flags: {latest.get('risk_assessment', []) if latest.get('risk_assessment') else 'None'}",
-        ]
-        context_parts.append("\n".join(analysis_lines))
+        add_part(
+            ANALYSIS_TEMPLATE.format(
+                filename=latest.get("filename", ""),
+                findings=latest.get("clinical_analysis", ""),
+                risk_flags=latest.get("risk_assessment") or "None",
+            )
+        )
 
     # 3. Current message (highlighted)
-    if getattr(state, "input_text", None):
-        query = state.input_text
-        context_parts.append(f'NEW MESSAGE FROM USER:\n  "{state.input_text}"')
-    else:
-        query = ""
-
+    query = getattr(state, "input_text", None) or ""
+    if not context_parts and not query:
+        return ""
     if query:
+        add_part(MESSAGE_TEMPLATE.format(message=query))
         filtered_chunks = filter_relevant_context(context_parts, query, top_k=4)
     else:
         filtered_chunks = context_parts
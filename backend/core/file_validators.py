@@ -8,6 +8,16 @@ class FileValidator:
     ALLOWED_MIME_TYPES = ["application/pdf"]
     MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 
+    @staticmethod
+    def validate_size(size: int) -> Tuple[bool, Optional[str]]:
+        """
+        Size-only check, usable on the upload's declared size before reading it.
+        Returns: (is_valid, error_message)
+        """
+        if size > FileValidator.MAX_FILE_SIZE:
+            return False, "File size exceeds 5MB limit"
+        return True, None
+
     @staticmethod
     def validate_file(file_bytes: bytes, filename: str) -> Tuple[bool, Optional[str]]:
         """
@@ -15,8 +25,9 @@ class FileValidator:
         Returns: (is_valid, error_message)
         """
         # Check 1: File size
-        if len(file_bytes) > FileValidator.MAX_FILE_SIZE:
-            return False, "File size exceeds 5MB limit"
+        is_valid, error = FileValidator.validate_size(len(file_bytes))
+        if not is_valid:
+            return is_valid, error
 
         # Check 2: File extension
         if not any(
@@ -0,0 +1,63 @@
+import hashlib
+import logging
+from typing import Any, Dict, Optional
+
+from cachetools import TTLCache
+
+logger = logging.getLogger("llm_cache")
+
+# Registry of named caches so they can all be cleared in one place.
+_caches: Dict[str, "LLMResponseCache"] = {}
+
+
+class LLMResponseCache:
+    """
+    In-process LRU cache with a TTL for LLM results, keyed by a content hash
+    of everything that determines the model output (model, temperature,
+    system prompt and user content).
+    """
+
+    def __init__(self, name: str, maxsize: int = 512, ttl: int = 3_600):
+        self.name = name
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+        _caches[name] = self
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        for part in parts:
+            digest.update(str(part).encode("utf-8"))
+            digest.update(b"\x00")  # separator so ("ab", "c") != ("a", "bc")
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._entries[key] = value
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self._entries),
+        }
+
+
+def clear_all_caches() -> None:
+    for cache in _caches.values():
+        cache.clear()
@@ -0,0 +1,47 @@
+from functools import lru_cache
+from typing import Optional
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+# One connection pool shared by every ChatOpenAI client; created and closed
+# by the FastAPI lifespan (see main.py)
+_http_async_client: Optional[httpx.AsyncClient] = None
+
+
+def init_http_client() -> httpx.AsyncClient:
+    """
+    Create the shared async HTTP client used for all OpenAI calls.
+    Timeouts mirror the OpenAI SDK defaults (10 min read, 5s connect).
+    """
+    global _http_async_client
+    _http_async_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_keepalive_connections=50, max_connections=100),
+        timeout=httpx.Timeout(600.0, connect=5.0),
+    )
+    # Drop clients built before the pool existed so they pick it up
+    get_llm.cache_clear()
+    return _http_async_client
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client and forget every client bound to it."""
+    global _http_async_client
+    client, _http_async_client = _http_async_client, None
+    get_llm.cache_clear()
+    if client is not None:
+        await client.aclose()
+
+
+@lru_cache(maxsize=16)
+def get_llm(model: str, temperature: float) -> ChatOpenAI:
+    """
+    Return a shared ChatOpenAI client for the given model and temperature.
+    Reusing the instance keeps its HTTP connection pool alive across requests
+    instead of rebuilding the client on every node invocation.
+    """
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        http_async_client=_http_async_client,
+    )
@@ -1,4 +1,5 @@
 import logging
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict
 
@@ -7,9 +8,13 @@ import yaml
 logger = logging.getLogger("prompt_loader")
 
 
+@lru_cache(maxsize=64)
 def load_prompt_config(module: str, key: str, version: str = "v1.0") -> Dict[str, Any]:
     """
     Load full prompt configuration including system, model, temperature, etc.
+    Results are memoized per (module, key, version) since prompt files are fixed
+    for a deployed version; the returned dict is shared and must not be mutated.
+    Call ``load_prompt_config.cache_clear()`` to pick up edited prompt files.
     Structure:
         prompts/module/version/config.yaml  (metadata: model, temperature, etc.)
         prompts/module/version/{key}.txt    (actual prompt text)
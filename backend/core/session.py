@@ -1,11 +1,104 @@
-import json
-import uuid
-from datetime import datetime
+import asyncio
+import logging
+import secrets
 from typing import Optional
-from zoneinfo import ZoneInfo
 
+import msgspec
+import zstandard
+from cachetools import TTLCache
 from redis.asyncio import Redis
 
+from core.clock import epoch
+
+logger = logging.getLogger("session")
+
+# Sessions are stored as MessagePack; the prefix keeps them apart from the
+# JSON-encoded ``session:`` keys written by earlier releases.
+SESSION_KEY_PREFIX = "msgpack-session:"
+
+
+class Session(msgspec.Struct):
+    """
+    Per-session state stored in Redis. Decoded straight into this struct
+    (no intermediate dict); fields added later need a default so that
+    sessions stored before them still decode.
+    """
+
+    session_id: str
+    # Unix seconds; stored as ints to keep payloads small
+    created_at: int
+    last_active: int
+    conversation_history: list = []
+    analysis: list = []
+    upload_history: list = []
+    limit_reached: bool = False
+    message_count: int = 0
+    upload_count: int = 0
+
+
+_encoder = msgspec.msgpack.Encoder()
+_decoder = msgspec.msgpack.Decoder(Session)
+
+# Payloads above this size are zstd-compressed and tagged with a prefix byte.
+# A msgpack-encoded Session always starts with a map marker (>= 0x80), so the
+# prefix can never be mistaken for an uncompressed payload.
+COMPRESS_MIN_BYTES = 1024
+COMPRESSED_PREFIX = b"\x01"
+
+_compressor = zstandard.ZstdCompressor(level=3)
+_decompressor = zstandard.ZstdDecompressor()
+
+
+def encode_session(session: Session) -> bytes:
+    payload = _encoder.encode(session)
+    if len(payload) > COMPRESS_MIN_BYTES:
+        return COMPRESSED_PREFIX + _compressor.compress(payload)
+    return payload
+
+
+def decode_session(data: bytes) -> Session:
+    if data[:1] == COMPRESSED_PREFIX:
+        data = _decompressor.decompress(data[1:])
+    return _decoder.decode(data)
+
+
+def load_session(session_id: str, data: bytes) -> Optional[Session]:
+    """
+    Decode a stored session, treating unreadable payloads (e.g. sessions
+    stored in an older schema) as missing so the caller starts a new one.
+    """
+    try:
+        return decode_session(data)
+    except (msgspec.DecodeError, zstandard.ZstdError) as e:
+        logger.warning("Discarding unreadable session %s: %s", session_id, e)
+        return None
+
+
+# In-process cache in front of Redis; kept well under the Redis TTL so another
+# worker's writes are picked up within L1_TTL_SECONDS. It holds the encoded
+# payload, and every hit decodes a fresh Session, so concurrent requests for
+# one session never share (and mutate) the same object.
+L1_MAX_SESSIONS = 1024
+L1_TTL_SECONDS = 30
+
+# Only the most recent turns are kept in the stored session; build_context reads
+# just the last few, so older turns would only add encode time and Redis bytes.
+MAX_CONVERSATION_HISTORY = 20
+
+# Write-behind: saves are queued and flushed in batches of up to
+# WRITE_BATCH_SIZE, waiting at most WRITE_BATCH_WINDOW_SECONDS to fill a batch.
+WRITE_BATCH_SIZE = 64
+WRITE_BATCH_WINDOW_SECONDS = 0.005
+
+# Redis client-side caching (BCAST mode): the server publishes the names of
+# modified session keys here, so L1 entries written by other workers are
+# dropped immediately instead of living out L1_TTL_SECONDS.
+INVALIDATION_CHANNEL = "__redis__:invalidate"
+# Our own SETEXs echo back as invalidations; they are counted so the L1 entry
+# (already current) is kept. Only SETEX is counted because its echo is
+# guaranteed; counts expire in case one is lost anyway.
+OWN_WRITE_TTL_SECONDS = 5
+
 
 class SessionManager:
     def __init__(self, redis_client: Redis, ttl: int = 1_800):
@@ -13,9 +106,90 @@ class SessionManager:
         # ttl is the expiry for each session entry (seconds); pulled from
         # settings in ``main.py`` so tests can override easily.
         self.ttl = ttl
-        self.sgt = ZoneInfo("Asia/Singapore")
+        self._l1 = TTLCache(maxsize=L1_MAX_SESSIONS, ttl=L1_TTL_SECONDS)
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._own_writes = TTLCache(maxsize=4096, ttl=OWN_WRITE_TTL_SECONDS)
+        self._pubsub = None
+        self._tracking_conn = None
+        self._invalidation_task: Optional[asyncio.Task] = None
 
-    async def get_or_create_session(self, session_id: Optional[str] = None) -> dict:
+    async def start_invalidation_listener(self):
+        """
+        Enable Redis client-side tracking for session keys and drop L1 entries
+        when the server reports them modified. Falls back to the L1 TTL alone
+        when the server does not support tracking (Redis < 6) or is unreachable.
+        """
+        pubsub = tracking = None
+        try:
+            # Invalidations are redirected to a subscribed connection (RESP2),
+            # so that connection's client id is needed before subscribing
+            pubsub = self.redis.pubsub()
+            await pubsub.connect()
+            await pubsub.connection.send_command("CLIENT", "ID")
+            client_id = await pubsub.connection.read_response()
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+
+            # Tracking is per connection, so one connection is kept out of the
+            # pool for as long as the listener runs
+            tracking = await self.redis.connection_pool.get_connection()
+            await tracking.send_command(
+                "CLIENT", "TRACKING", "ON", "REDIRECT", client_id,
+                "BCAST", "PREFIX", SESSION_KEY_PREFIX,
+            )  # fmt: skip
+            await tracking.read_response()
+        except Exception as e:
+            logger.warning(
+                "Redis client-side tracking unavailable; session L1 cache relies on its TTL: %s",
+                e,
+            )
+            if tracking is not None:
+                await self.redis.connection_pool.release(tracking)
+            if pubsub is not None:
+                await pubsub.aclose()
+            return
+
+        self._pubsub, self._tracking_conn = pubsub, tracking
+        self._invalidation_task = asyncio.create_task(self._listen_invalidations())
+
+    async def close_invalidation_listener(self):
+        """Stop listening for invalidations and turn tracking off."""
+        if self._invalidation_task is None:
+            return
+        task, self._invalidation_task = self._invalidation_task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+        tracking, self._tracking_conn = self._tracking_conn, None
+        try:
+            await tracking.send_command("CLIENT", "TRACKING", "OFF")
+            await tracking.read_response()
+        except Exception as e:
+            logger.warning("Failed to turn off Redis client-side tracking: %s", e)
+        await self.redis.connection_pool.release(tracking)
+
+        pubsub, self._pubsub = self._pubsub, None
+        await pubsub.aclose()
+
+    def start_writer(self):
+        """Start the background task that flushes queued session writes."""
+        self._write_queue = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._drain_writes(self._write_queue))
+
+    async def close_writer(self):
+        """Flush any queued writes and stop the background writer."""
+        if self._writer_task is None:
+            return
+        queue, task = self._write_queue, self._writer_task
+        self._write_queue = self._writer_task = None
+        # Sentinel: the drainer flushes what it has and exits
+        queue.put_nowait(None)
+        await task
+
+    async def get_or_create_session(self, session_id: Optional[str] = None) -> Session:
         if session_id and session_id.strip():
             session = await self.get_session(session_id)
             if session:
@@ -23,33 +197,162 @@ class SessionManager:
                 return session
 
         new_session_id = self._generate_session_id()
-        session_data = {
-            "session_id": new_session_id,
-            "created_at": datetime.now(self.sgt).isoformat(),
-            "last_active": datetime.now(self.sgt).isoformat(),
-            "conversation_history": [],
-            "analysis": [],
-            "upload_history": [],
-            "limit_reached": False,
-            "message_count": 0,
-            "upload_count": 0,
-        }
+        now = epoch()
+        session_data = Session(
+            session_id=new_session_id,
+            created_at=now,
+            last_active=now,
+        )
         await self.save_session(new_session_id, session_data)
         return session_data
 
-    async def get_session(self, session_id: str) -> Optional[dict]:
-        data = await self.redis.get(f"session:{session_id}")
-        if data:
-            return json.loads(data)
-        return None
+    async def get_session(self, session_id: str) -> Optional[Session]:
+        data = self._l1.get(session_id)
+        if data is not None:
+            return load_session(session_id, data)
+
+        data = await self.redis.get(self._key(session_id))
+        if not data:
+            return None
+        session = load_session(session_id, data)
+        if session is not None:
+            # Only fills from Redis are cached: re-inserting on a hit would
+            # reset the entry's TTL and keep a busy session stale forever
+            self._l1[session_id] = data
+        return session
+
+    async def get_sessions(self, session_ids: list[str]) -> list[Optional[Session]]:
+        """
+        Fetch several sessions at once, in the order given (None for missing
+        ones). Sessions not in the L1 cache are read with a single MGET.
+        """
+        payloads = [self._l1.get(session_id) for session_id in session_ids]
+        missing = [i for i, data in enumerate(payloads) if data is None]
+        if missing:
+            raws = await self.redis.mget([self._key(session_ids[i]) for i in missing])
+            for i, data in zip(missing, raws):
+                payloads[i] = data
+        from_redis = set(missing)
+
+        sessions = []
+        for i, (session_id, data) in enumerate(zip(session_ids, payloads)):
+            session = load_session(session_id, data) if data else None
+            if session is not None and i in from_redis:
+                self._l1[session_id] = data
+            sessions.append(session)
+        return sessions
+
+    async def save_session(self, session_id: str, data: Session):
+        history = data.conversation_history
+        if len(history) > MAX_CONVERSATION_HISTORY:
+            data.conversation_history = history[-MAX_CONVERSATION_HISTORY:]
+
+        # L1 is updated first so this process reads its own write even while
+        # the Redis write is still queued
+        key, payload = self._key(session_id), encode_session(data)
+        self._l1[session_id] = payload
+        if self._write_queue is not None:
+            self._write_queue.put_nowait((key, payload))
+        else:
+            self._note_own_write(key)
+            try:
+                await self.redis.setex(key, self.ttl, payload)
+            except Exception:
+                self._forget_own_write(key)
+                raise
+
+    async def extend_session(self, session_id: str, session: Session):
+        # Refresh the TTL without re-encoding the whole session; last_active
+        # is only updated in memory and persisted with the turn's save.
+        # Not counted as an own write: EXPIRE on a key that has already gone
+        # produces no invalidation, and a stale count would swallow another
+        # worker's. The echo just evicts L1, which the turn's save refills.
+        session.last_active = epoch()
+        await self.redis.expire(self._key(session_id), self.ttl)
+
+    async def _drain_writes(self, queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await queue.get()
+            if item is None:
+                break
+
+            # Later saves of the same session supersede earlier ones in the batch;
+            # the single FIFO drainer keeps per-session ordering across batches.
+            batch = dict([item])
+            deadline = loop.time() + WRITE_BATCH_WINDOW_SECONDS
+            while len(batch) < WRITE_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                key, payload = item
+                batch[key] = payload
+
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for key, payload in batch.items():
+                        self._note_own_write(key)
+                        pipe.setex(key, self.ttl, payload)
+                    await pipe.execute()
+            except Exception as e:
+                logger.error("Failed to flush %d session writes: %s", len(batch), e)
+                for key in batch:
+                    self._forget_own_write(key)
+
+    async def _listen_invalidations(self):
+        try:
+            async for message in self._pubsub.listen():
+                if message["type"] == "message":
+                    self._invalidate(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Tracking is gone with the connection; L1 falls back to its TTL
+            logger.warning("Lost Redis invalidation stream: %s", e)
+            self._l1.clear()
+
+    def _invalidate(self, keys):
+        if keys is None:
+            # The server dropped its tracking state (e.g. FLUSHALL)
+            self._l1.clear()
+            return
+
+        for key in keys:
+            key = key.decode() if isinstance(key, bytes) else key
+            session_id = key.removeprefix(SESSION_KEY_PREFIX)
+            if session_id == key or ":" in session_id:
+                # Not a session key (ids never contain ":")
+                continue
+            if self._own_writes.get(key):
+                # Echo of a write made by this process; L1 already holds it
+                self._forget_own_write(key)
+                continue
+            self._l1.pop(session_id, None)
+
+    def _note_own_write(self, key: str):
+        if self._invalidation_task is not None:
+            self._own_writes[key] = self._own_writes.get(key, 0) + 1
 
-    async def save_session(self, session_id: str, data: dict):
-        await self.redis.setex(f"session:{session_id}", self.ttl, json.dumps(data))
+    def _forget_own_write(self, key: str):
+        # Drop one expected echo: consumed by an invalidation, or the write failed
+        pending = self._own_writes.get(key)
+        if pending == 1:
+            del self._own_writes[key]
+        elif pending:
+            self._own_writes[key] = pending - 1
 
-    async def extend_session(self, session_id: str, session: dict):
-        session["last_active"] = datetime.now(self.sgt).isoformat()
-        await self.save_session(session_id, session)
-        await self.redis.expire(f"session:{session_id}", self.ttl)
+    @staticmethod
+    def _key(session_id: str) -> str:
+        return f"{SESSION_KEY_PREFIX}{session_id}"
 
     def _generate_session_id(self) -> str:
-        return f"sess_{uuid.uuid4().hex}"
+        # 16 random bytes, URL-safe base64 (22 chars)
+        return "sess_" + secrets.token_urlsafe(16)
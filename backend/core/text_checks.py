@@ -0,0 +1,68 @@
+import logging
+import re
+
+logger = logging.getLogger("text_checks")
+
+# Bare greetings/thanks. The orchestrator classifies them as OFF_TOPIC without
+# an LLM call and the input guardrail lets them past its spam check.
+# Acknowledgements like "ok" are left out: mid-conversation they reply to the
+# previous turn, so they go to the classifier along with the conversation context.
+GREETING_RE = re.compile(
+    r"^\s*(hi|hello|hey|thanks|thank you|good (morning|afternoon|evening))"
+    r"( there)?\s*\W*$",
+    re.IGNORECASE,
+)
+
+INJECTION_PATTERNS = (
+    "ignore previous instructions",
+    "reveal system prompt",
+    "developer mode",
+    "system prompt",
+    "bypass filters",
+    "jailbreak",
+)
+
+RISKY_OUTPUT_KEYWORDS = (
+    "take .* mg",
+    "dosage",
+    "prescribe",
+    "stop taking",
+    "start taking",
+    "you should take",
+    "diagnose",
+    "treatment plan",
+)
+
+
+# Prompt injection detection
+def detect_prompt_injection(user_input: str) -> bool:
+    lower_input = user_input.lower()
+    for pattern in INJECTION_PATTERNS:
+        if pattern in lower_input:
+            logger.warning(
+                "Potential prompt injection detected: '%s' found in user input.",
+                pattern,
+            )
+            return True
+
+    return False
+
+
+# Sanitization to remove potentially harmful content
+def sanitize_user_input(user_input: str) -> str:
+    sanitized = user_input
+    for pattern in INJECTION_PATTERNS:
+        sanitized = re.sub(pattern, "", sanitized, flags=re.IGNORECASE)
+    return sanitized
+
+
+# Additional check for medical advice in output
+def detect_medical_output_risk(output: str) -> bool:
+    for keyword in RISKY_OUTPUT_KEYWORDS:
+        if re.search(keyword, output, re.IGNORECASE):
+            logger.warning(
+                "Potential medical advice detected in output: '%s' found.", keyword
+            )
+            return True
+
+    return False
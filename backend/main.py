@@ -10,8 +10,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from redis.asyncio import Redis
 
+from agents.document_processing.document_parser import shutdown_process_pool
 from api.routes import chat, health
 from config.settings import settings
+from core.llm_clients import close_http_client, init_http_client
 from core.session import SessionManager
 
 # Configure logging globally
@@ -33,11 +35,19 @@ def create_app(include_chat_routes: bool = True) -> FastAPI:
             # make sure the OpenAI key is available to downstream libraries
             os.environ.setdefault("OPENAI_API_KEY", settings.OPENAI_API_KEY)
 
+            # Shared connection pool for all OpenAI calls
+            init_http_client()
+
             # Create a Redis client using whatever URL the environment provides.
-            redis_client = Redis.from_url(settings.REDIS_URL, decode_responses=True)
+            # Responses stay as bytes: sessions are stored as MessagePack.
+            redis_client = Redis.from_url(settings.REDIS_URL, decode_responses=False)
             app.state.session_manager = SessionManager(
                 redis_client, ttl=settings.SESSION_TTL_SECONDS
             )
+            # Session saves are flushed to Redis in the background, and other
+            # workers' writes evict this worker's cached copies
+            app.state.session_manager.start_writer()
+            await app.state.session_manager.start_invalidation_listener()
 
             # Build graph once
             app.state.graph = chat.build_graph()
@@ -47,7 +57,11 @@ def create_app(include_chat_routes: bool = True) -> FastAPI:
 
         # Shutdown
         if include_chat_routes:
+            await app.state.session_manager.close_invalidation_listener()
+            await app.state.session_manager.close_writer()
             await app.state.session_manager.redis.close()
+            await close_http_client()
+            shutdown_process_pool()
 
     # Create FastAPI app with production-safe defaults. Swagger/OpenAPI
     # endpoints and documentation are disabled when ENV=production so the
@@ -8,6 +8,7 @@ from types import SimpleNamespace
 import pytest
 from fastapi.testclient import TestClient
 
+from core.session import Session
 from main import app
 
 pytestmark = pytest.mark.skipif(
@@ -40,6 +41,12 @@ class FakeSessionManager:
     async def _close(self):
         return None
 
+    async def close_writer(self):
+        return None
+
+    async def close_invalidation_listener(self):
+        return None
+
     async def get_or_create_session(self, session_id=None):
         if session_id and session_id in self.sessions:
             return self.sessions[session_id]
@@ -48,15 +55,9 @@ class FakeSessionManager:
             self.counter += 1
             session_id = f"sit-session-{self.counter}"
 
-        session = self.sessions.get(session_id) or {
-            "session_id": session_id,
-            "conversation_history": [],
-            "analysis": [],
-            "upload_history": [],
-            "message_count": 0,
-            "upload_count": 0,
-            "last_active": None,
-        }
+        session = self.sessions.get(session_id) or Session(
+            session_id=session_id, created_at=0, last_active=0
+        )
         self.sessions[session_id] = session
         return session
 
@@ -76,6 +77,10 @@ class FakeGraph:
         yield {"event": "on_chain_end", "name": "LangGraph", "data": {"output": output}}
 
 
+# Stop the real manager's invalidation listener and background writer before
+# swapping in the fake, so its pubsub and tracking connections are released
+client.portal.call(app.state.session_manager.close_invalidation_listener)
+client.portal.call(app.state.session_manager.close_writer)
 app.state.session_manager = FakeSessionManager()
 app.state.graph = FakeGraph()
 
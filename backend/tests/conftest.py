@@ -1,7 +1,19 @@
 import os
 
+import pytest
+
 
 # Disable Langfuse/OTEL exports during tests so pytest runs terminate cleanly
 # without network retries or exporter shutdown delays.
 os.environ.setdefault("LANGFUSE_TRACING_ENABLED", "false")
-os.environ.setdefault("OTEL_SDK_DISABLED", "true")
\ No newline at end of file
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+
+@pytest.fixture(autouse=True)
+def clear_llm_caches():
+    """Start every test with empty LLM response caches so results don't leak between tests."""
+    from core.llm_cache import clear_all_caches
+
+    clear_all_caches()
+    yield
+    clear_all_caches()
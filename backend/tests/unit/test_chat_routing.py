@@ -0,0 +1,54 @@
+import pytest
+from api.routes.chat import (
+    route_after_insights,
+    route_from_clinical_analysis,
+    route_from_document_parser,
+    route_from_orchestrator,
+    route_from_pii_removal,
+    route_from_qna,
+    route_from_risk_assessment,
+)
+
+
+class DummyState:
+    def __init__(self, next_node=None, final_response=None, input_text=None):
+        self.next_node = next_node
+        self.final_response = final_response
+        self.input_text = input_text
+
+
+@pytest.mark.parametrize(
+    "route,next_node,input_text,expected",
+    [
+        (route_from_orchestrator, "doc_pipeline", None, "document_parser"),
+        (route_from_orchestrator, "qna", "What is HbA1c?", "qna"),
+        (route_from_document_parser, "pii_removal", None, "pii_removal"),
+        (route_from_pii_removal, "clinical_analysis", None, "clinical_analysis"),
+        (route_from_pii_removal, "clinical_analysis", "Is this ok?", "combined_analysis"),
+        (route_from_clinical_analysis, "risk_assessment", None, "risk_assessment"),
+        (route_after_insights, "qna", "Is this ok?", "qna"),
+        (route_from_risk_assessment, "insights_summary", None, "insights_summary"),
+        (route_from_qna, "compliance", "What is HbA1c?", "compliance"),
+    ],
+)
+def test_routes_follow_next_node(route, next_node, input_text, expected):
+    """Test each router follows the node's next_node when no reply is set yet."""
+    assert route(DummyState(next_node, input_text=input_text)) == expected
+
+
+@pytest.mark.parametrize(
+    "route,next_node",
+    [
+        (route_from_orchestrator, "end"),
+        (route_from_document_parser, "end"),
+        (route_from_pii_removal, "end"),
+        (route_from_clinical_analysis, "compliance"),
+        (route_after_insights, "compliance"),
+        (route_from_risk_assessment, "end"),
+        (route_from_qna, "compliance"),
+    ],
+)
+def test_routes_skip_to_end_when_response_ready(route, next_node):
+    """Test routers end the graph once a node has set final_response."""
+    state = DummyState(next_node, final_response="An error has occurred. Please try again later.")
+    assert route(state) == "END"
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 from agents.document_processing.agent.clinical_analysis import clinical_analysis_node
 
 
@@ -14,17 +14,16 @@ class DummyState:
     "llm_output,input_text,expected_next_node",
     [
         ("MEDICAL ANALYSIS CONTENT", "Follow-up question", "risk_assessment"),
-        ("OFF_TOPIC", "Follow-up question", "qna"),
         ("OFF_TOPIC", "", "compliance"),
         ("OFF_TOPIC", None, "compliance"),
         ("ANALYSIS OF HEALTH RECORDS", None, "risk_assessment"),
     ],
 )
-def test_clinical_analysis_node_unit(llm_output, input_text, expected_next_node):
+async def test_clinical_analysis_node_unit(llm_output, input_text, expected_next_node):
     """Test clinical analysis node with various outputs."""
-    with patch("agents.document_processing.agent.clinical_analysis.ChatOpenAI") as mock_chatopenai:
-        mock_instance = mock_chatopenai.return_value
-        mock_instance.invoke.return_value = type(
+    with patch("agents.document_processing.agent.clinical_analysis.get_llm") as mock_get_llm:
+        mock_instance = mock_get_llm.return_value
+        mock_instance.ainvoke = AsyncMock(return_value=type(
             "obj",
             (),
             {
@@ -34,25 +33,52 @@ def test_clinical_analysis_node_unit(llm_output, input_text, expected_next_node)
                     "model_name": "gpt-4o-mini",
                 },
             },
-        )()
+        )())
 
         state = DummyState("Sanitized medical text", input_text)
-        result = clinical_analysis_node(state)
+        result = await clinical_analysis_node(state)
 
         assert result["next_node"] == expected_next_node
         assert "clinical_analysis" in result
         assert "last_updated" in result
-        assert result["sanitized_text"] is None  # Should be cleared
+        if expected_next_node == "risk_assessment":
+            assert "sanitized_text" not in result  # Kept for risk assessment
+        else:
+            assert result["sanitized_text"] is None  # Should be cleared
 
 
-def test_clinical_analysis_node_error():
+async def test_clinical_analysis_node_error():
     """Test error handling in clinical analysis."""
-    with patch("agents.document_processing.agent.clinical_analysis.ChatOpenAI") as mock_chatopenai:
-        mock_chatopenai.return_value.invoke.side_effect = Exception("LLM error")
+    with patch("agents.document_processing.agent.clinical_analysis.get_llm") as mock_get_llm:
+        mock_get_llm.return_value.ainvoke = AsyncMock(side_effect=Exception("LLM error"))
 
         state = DummyState("Some text")
-        result = clinical_analysis_node(state)
+        result = await clinical_analysis_node(state)
 
         assert result["next_node"] == "end"
         assert "error" in result["final_response"].lower()
         assert result["sanitized_text"] is None
+
+
+async def test_clinical_analysis_node_reuses_cached_result():
+    """Test identical documents are served from the analysis cache."""
+    with patch("agents.document_processing.agent.clinical_analysis.get_llm") as mock_get_llm:
+        mock_instance = mock_get_llm.return_value
+        mock_instance.ainvoke = AsyncMock(return_value=type(
+            "obj",
+            (),
+            {
+                "content": "MEDICAL ANALYSIS CONTENT",
+                "response_metadata": {
+                    "token_usage": {"prompt_tokens": 1, "completion_tokens": 1},
+                    "model_name": "gpt-4o-mini",
+                },
+            },
+        )())
+
+        first = await clinical_analysis_node(DummyState("Same report text"))
+        second = await clinical_analysis_node(DummyState("Same report text"))
+
+        assert mock_instance.ainvoke.await_count == 1
+        assert first["clinical_analysis"] == second["clinical_analysis"]
+        assert second["next_node"] == "risk_assessment"
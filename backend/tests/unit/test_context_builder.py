@@ -0,0 +1,39 @@
+from core.context_builder import CONTEXT_TURNS, build_context
+
+
+class DummyState:
+    def __init__(self, input_text=None, conversation_history=None, analysis=None):
+        self.input_text = input_text
+        self.conversation_history = conversation_history
+        self.analysis = analysis
+
+
+def _turn(i):
+    return {"input_text_snippet": f"question {i}", "response_snippet": f"answer {i}"}
+
+
+def test_build_context_renders_last_turns_numbered_within_window():
+    """Test only the last CONTEXT_TURNS turns are rendered, numbered from 1."""
+    history = [_turn(i) for i in range(1, 26)]
+    context = build_context(DummyState(conversation_history=history))
+
+    assert context == "CONVERSATION HISTORY:\n" + "\n".join(
+        "  Turn %d:\n    User: question %d\n    Assistant: answer %d" % (n, i, i)
+        for n, i in enumerate(range(26 - CONTEXT_TURNS, 26), 1)
+    )
+
+
+def test_build_context_renders_short_history():
+    """Test build_context renders every turn of a history shorter than the window."""
+    state = DummyState(conversation_history=[_turn(1), _turn(2)])
+    context = build_context(state)
+
+    assert context.startswith("CONVERSATION HISTORY:")
+    assert "Turn 2:\n    User: question 2" in context
+    assert "Turn 3:" not in context
+
+
+def test_build_context_empty_state_returns_empty_string():
+    """Test build_context returns a str even when there is nothing to include."""
+    assert build_context(DummyState()) == ""
+    assert build_context(DummyState(input_text="", conversation_history=[], analysis=[])) == ""
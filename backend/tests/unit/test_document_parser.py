@@ -1,6 +1,8 @@
 import pytest
 from unittest.mock import patch, MagicMock
-from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from agents.document_processing import document_parser
 from agents.document_processing.document_parser import document_parser_node
 
 
@@ -20,68 +22,161 @@ class DummyState:
         (b"", {}, "end"),
     ],
 )
-def test_document_parser_node_unit(file_bytes, file_meta, expected_next_node):
+async def test_document_parser_node_unit(file_bytes, file_meta, expected_next_node):
     """Test document parser node with various inputs."""
     with patch("agents.document_processing.document_parser.pymupdf") as mock_pymupdf, \
          patch("agents.document_processing.document_parser.pymupdf4llm") as mock_pymupdf4llm:
 
         if file_bytes:
             # Mock successful PDF parsing
-            mock_doc = MagicMock()
+            mock_doc = MagicMock(page_count=1)
             mock_pymupdf.open.return_value = mock_doc
-            mock_pymupdf4llm.to_markdown.return_value = "Parsed markdown content"
+            mock_pymupdf4llm.to_markdown.return_value = [{"text": "Parsed markdown content"}]
 
         state = DummyState(file_bytes, file_meta)
-        result = document_parser_node(state)
+        result = await document_parser_node(state)
 
         assert result["next_node"] == expected_next_node
         assert result["file_bytes"] is None  # file_bytes should be cleared
         assert "last_updated" in result
 
 
-def test_document_parser_node_parsing_error():
+async def test_document_parser_node_parsing_error():
     """Test document parser node error handling."""
     with patch("agents.document_processing.document_parser.pymupdf") as mock_pymupdf:
         mock_pymupdf.open.side_effect = Exception("PDF parsing error")
 
         state = DummyState(b"Invalid PDF", {"filename": "bad.pdf"})
-        result = document_parser_node(state)
+        result = await document_parser_node(state)
 
         assert result["next_node"] == "compliance"
         assert "error" in result["final_response"].lower()
         assert result["file_bytes"] is None
 
 
-def test_document_parser_node_large_file():
+async def test_document_parser_node_large_file():
     """Test document parser handles large files successfully."""
     with patch("agents.document_processing.document_parser.pymupdf") as mock_pymupdf, \
          patch("agents.document_processing.document_parser.pymupdf4llm") as mock_pymupdf4llm:
 
-        mock_doc = MagicMock()
+        mock_doc = MagicMock(page_count=1)
         mock_pymupdf.open.return_value = mock_doc
         large_content = "Parsed content " * 1000  # Simulate large document
-        mock_pymupdf4llm.to_markdown.return_value = large_content
+        mock_pymupdf4llm.to_markdown.return_value = [{"text": large_content}]
 
         state = DummyState(b"Large PDF content", {"filename": "large_file.pdf", "size": 5000000})
-        result = document_parser_node(state)
+        result = await document_parser_node(state)
 
         assert result["next_node"] == "pii_removal"
-        assert len(result["parsed_text"]) > 1000
-        assert "<UNTRUSTED_DATA>" in result["parsed_text"]
+        assert result["parsed_pages"] == [large_content]
+        assert "parsed_text" not in result
 
 
-def test_document_parser_node_preserves_untrusted_data_wrapper():
-    """Test document parser wraps content with UNTRUSTED_DATA tags."""
+async def test_document_parser_node_returns_pages_only():
+    """Test document parser passes on the pages without a joined copy of the document."""
     with patch("agents.document_processing.document_parser.pymupdf") as mock_pymupdf, \
          patch("agents.document_processing.document_parser.pymupdf4llm") as mock_pymupdf4llm:
 
-        mock_doc = MagicMock()
+        mock_doc = MagicMock(page_count=1)
         mock_pymupdf.open.return_value = mock_doc
-        mock_pymupdf4llm.to_markdown.return_value = "Medical information"
+        mock_pymupdf4llm.to_markdown.return_value = [{"text": "Medical information"}]
 
         state = DummyState(b"PDF", {"filename": "test.pdf"})
-        result = document_parser_node(state)
+        result = await document_parser_node(state)
 
-        assert "<UNTRUSTED_DATA>" in result["parsed_text"]
-        assert "</UNTRUSTED_DATA>" in result["parsed_text"]
-        assert "Medical information" in result["parsed_text"]
+        assert result["parsed_pages"] == ["Medical information"]
+        assert "parsed_text" not in result
+
+
+def _markdown_pages(page_count):
+    # to_markdown stand-in: one chunk per requested page (all pages when pages is None)
+    def to_markdown(doc, pages, page_chunks):
+        return [{"text": f"page {i}"} for i in (range(page_count) if pages is None else pages)]
+
+    return to_markdown
+
+
+async def test_document_parser_node_splits_large_pdf_into_page_batches():
+    """Test long PDFs are converted in page batches and joined in order when several CPUs are available."""
+    with patch("agents.document_processing.document_parser.pymupdf") as mock_pymupdf, \
+         patch("agents.document_processing.document_parser.pymupdf4llm") as mock_pymupdf4llm, \
+         patch("agents.document_processing.document_parser.os.cpu_count", return_value=4), \
+         patch("agents.document_processing.document_parser._get_process_pool",
+               return_value=ThreadPoolExecutor(max_workers=2)):
+
+        mock_pymupdf.open.return_value = MagicMock(page_count=40)
+        mock_pymupdf4llm.to_markdown.side_effect = _markdown_pages(40)
+
+        state = DummyState(b"Many pages", {"filename": "long.pdf"})
+        result = await document_parser_node(state)
+
+        assert result["next_node"] == "pii_removal"
+        assert result["parsed_pages"] == [f"page {i}" for i in range(40)]
+        assert mock_pymupdf4llm.to_markdown.call_count == 5
+
+
+async def test_document_parser_node_parses_in_process_on_one_cpu():
+    """Test a single CPU never starts the process pool, however long the PDF."""
+    with patch("agents.document_processing.document_parser.pymupdf") as mock_pymupdf, \
+         patch("agents.document_processing.document_parser.pymupdf4llm") as mock_pymupdf4llm, \
+         patch("agents.document_processing.document_parser.os.cpu_count", return_value=1), \
+         patch("agents.document_processing.document_parser._get_process_pool") as mock_pool:
+
+        mock_pymupdf.open.return_value = MagicMock(page_count=40)
+        mock_pymupdf4llm.to_markdown.side_effect = _markdown_pages(40)
+
+        result = await document_parser_node(DummyState(b"Many pages", {"filename": "long.pdf"}))
+
+        assert result["parsed_pages"] == [f"page {i}" for i in range(40)]
+        mock_pool.assert_not_called()
+
+
+async def test_document_parser_node_recovers_from_broken_pool():
+    """Test a broken process pool is discarded and the PDF is parsed in-process."""
+    broken = MagicMock()
+    broken.map.side_effect = BrokenProcessPool("worker died")
+    with patch("agents.document_processing.document_parser.pymupdf") as mock_pymupdf, \
+         patch("agents.document_processing.document_parser.pymupdf4llm") as mock_pymupdf4llm, \
+         patch("agents.document_processing.document_parser.os.cpu_count", return_value=4), \
+         patch.object(document_parser, "_process_pool", broken):
+
+        mock_pymupdf.open.return_value = MagicMock(page_count=40)
+        mock_pymupdf4llm.to_markdown.side_effect = _markdown_pages(40)
+
+        result = await document_parser_node(DummyState(b"Many pages", {"filename": "long.pdf"}))
+
+        assert result["next_node"] == "pii_removal"
+        assert result["parsed_pages"] == [f"page {i}" for i in range(40)]
+        broken.shutdown.assert_called_once()
+        assert document_parser._process_pool is None
+
+
+async def test_document_parser_node_falls_back_when_pool_is_shut_down():
+    """Test a pool shut down by another thread mid-parse falls back to in-process parsing."""
+    closed = ThreadPoolExecutor(max_workers=1)
+    closed.shutdown()
+    with patch("agents.document_processing.document_parser.pymupdf") as mock_pymupdf, \
+         patch("agents.document_processing.document_parser.pymupdf4llm") as mock_pymupdf4llm, \
+         patch("agents.document_processing.document_parser.os.cpu_count", return_value=4), \
+         patch("agents.document_processing.document_parser._get_process_pool", return_value=closed):
+
+        mock_pymupdf.open.return_value = MagicMock(page_count=40)
+        mock_pymupdf4llm.to_markdown.side_effect = _markdown_pages(40)
+
+        result = await document_parser_node(DummyState(b"Many pages", {"filename": "long.pdf"}))
+
+        assert result["next_node"] == "pii_removal"
+        assert result["parsed_pages"] == [f"page {i}" for i in range(40)]
+
+
+def test_concurrent_callers_share_one_process_pool():
+    """Test threads racing to create the pool all get the same one."""
+    with patch.object(document_parser, "_process_pool", None), \
+         patch("agents.document_processing.document_parser.ProcessPoolExecutor") as mock_executor, \
+         ThreadPoolExecutor(max_workers=8) as threads:
+
+        mock_executor.side_effect = lambda **kwargs: MagicMock()
+        pools = list(threads.map(lambda _: document_parser._get_process_pool(), range(8)))
+
+        mock_executor.assert_called_once()
+        assert all(pool is pools[0] for pool in pools)
@@ -1,7 +1,8 @@
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import AsyncMock, patch, MagicMock
 import asyncio
 from agents.guardrail.input_guardrail import input_guardrail_node
+from core.session import Session
 
 
 class DummyFile:
@@ -18,10 +19,14 @@ class DummyState:
     def __init__(self, input_text=None, file=None, session_data=None):
         self.input_text = input_text
         self.file = file
-        self.session_data = session_data or {"message_count": 0, "upload_count": 0}
+        self.session_data = session_data or _session()
         self.session_id = "test-session"
 
 
+def _session(**fields):
+    return Session(session_id="test-session", created_at=0, last_active=0, **fields)
+
+
 def _mock_llm_response(content: str):
     return type(
         "obj",
@@ -38,11 +43,11 @@ def _mock_llm_response(content: str):
 
 def test_input_guardrail_valid_text():
     """Test input guardrail passes valid text."""
-    with patch("agents.guardrail.input_guardrail.ChatOpenAI") as mock_chatopenai, \
+    with patch("agents.guardrail.input_guardrail.get_llm") as mock_get_llm, \
          patch("agents.guardrail.input_guardrail.load_prompt_config"):
 
-        mock_instance = mock_chatopenai.return_value
-        mock_instance.invoke.return_value = _mock_llm_response('{"verdict": "pass"}')
+        mock_instance = mock_get_llm.return_value
+        mock_instance.ainvoke = AsyncMock(return_value=_mock_llm_response('{"verdict": "pass"}'))
 
         state = DummyState(input_text="What is diabetes?")
         result = asyncio.run(input_guardrail_node(state))
@@ -92,7 +97,7 @@ def test_input_guardrail_max_messages_exceeded():
 
     state = DummyState(
         input_text="Valid question",
-        session_data={"message_count": settings.MAX_MESSAGES_PER_SESSION, "upload_count": 0}
+        session_data=_session(message_count=settings.MAX_MESSAGES_PER_SESSION)
     )
     result = asyncio.run(input_guardrail_node(state))
 
@@ -113,6 +118,21 @@ def test_input_guardrail_valid_file():
         assert result["input_guardrail_passed"] is not False or result.get("next_node") != "END"
 
 
+def test_input_guardrail_file_meta_has_content_hash():
+    """Test a valid upload gets a content hash for re-upload detection."""
+    with patch("agents.guardrail.input_guardrail.FileValidator") as mock_validator:
+        mock_validator.validate_file.return_value = (True, "")
+
+        pdf_bytes = b"%PDF-1.4\n..."
+        state = DummyState(file=DummyFile("test.pdf", "application/pdf", pdf_bytes))
+        first = asyncio.run(input_guardrail_node(state))
+        state = DummyState(file=DummyFile("renamed.pdf", "application/pdf", pdf_bytes))
+        second = asyncio.run(input_guardrail_node(state))
+
+        assert len(first["file_meta"]["content_hash"]) == 32
+        assert first["file_meta"]["content_hash"] == second["file_meta"]["content_hash"]
+
+
 def test_input_guardrail_invalid_file():
     """Test input guardrail rejects invalid file."""
     with patch("agents.guardrail.input_guardrail.FileValidator") as mock_validator:
@@ -127,14 +147,28 @@ def test_input_guardrail_invalid_file():
         assert "file too large" in result["input_guardrail_block_reason"].lower()
 
 
+def test_input_guardrail_oversized_file_rejected_before_read():
+    """Test input guardrail rejects an oversized upload from its size without reading it."""
+    file = DummyFile("big.pdf", "application/pdf", b"")
+    file.size = 6 * 1024 * 1024
+    file.read = MagicMock(side_effect=AssertionError("file should not be read"))
+    state = DummyState(file=file)
+    result = asyncio.run(input_guardrail_node(state))
+
+    assert result["input_guardrail_passed"] is False
+    assert "exceeds 5mb" in result["input_guardrail_block_reason"].lower()
+
+
 def test_input_guardrail_llm_classification_suspicious():
     """Test input guardrail blocks when LLM detects suspicious content."""
-    with patch("agents.guardrail.input_guardrail.ChatOpenAI") as mock_chatopenai, \
+    with patch("agents.guardrail.input_guardrail.get_llm") as mock_get_llm, \
          patch("agents.guardrail.input_guardrail.load_prompt_config"):
 
-        mock_instance = mock_chatopenai.return_value
-        mock_instance.invoke.return_value = _mock_llm_response(
-            '{"verdict": "block", "threat_type": "harmful_intent", "reason": "Contains harmful content"}'
+        mock_instance = mock_get_llm.return_value
+        mock_instance.ainvoke = AsyncMock(
+            return_value=_mock_llm_response(
+                '{"verdict": "block", "threat_type": "harmful_intent", "reason": "Contains harmful content"}'
+            )
         )
 
         state = DummyState(input_text="How to cause harm")
@@ -146,12 +180,14 @@ def test_input_guardrail_llm_classification_suspicious():
 
 def test_input_guardrail_llm_classification_pass():
     """Test input guardrail passes when LLM approves content."""
-    with patch("agents.guardrail.input_guardrail.ChatOpenAI") as mock_chatopenai, \
+    with patch("agents.guardrail.input_guardrail.get_llm") as mock_get_llm, \
          patch("agents.guardrail.input_guardrail.load_prompt_config"):
 
-        mock_instance = mock_chatopenai.return_value
-        mock_instance.invoke.return_value = _mock_llm_response(
-            '{"verdict": "pass", "threat_type": "none"}'
+        mock_instance = mock_get_llm.return_value
+        mock_instance.ainvoke = AsyncMock(
+            return_value=_mock_llm_response(
+                '{"verdict": "pass", "threat_type": "none"}'
+            )
         )
 
         state = DummyState(input_text="What is diabetes?")
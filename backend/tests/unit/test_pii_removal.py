@@ -4,8 +4,8 @@ from agents.document_processing.pii_removal import pii_removal_node
 
 
 class DummyState:
-    def __init__(self, parsed_text):
-        self.parsed_text = parsed_text
+    def __init__(self, parsed_pages):
+        self.parsed_pages = parsed_pages
         self.session_id = "test-session"
 
 
@@ -26,7 +26,7 @@ def test_pii_removal_node_success():
         mock_anonymized.text = "Anonymous text with [PERSON_1] redacted"
         mock_anonymizer.anonymize.return_value = mock_anonymized
 
-        state = DummyState("<UNTRUSTED_DATA>\nJohn Smith works here\n</UNTRUSTED_DATA>")
+        state = DummyState(["John Smith works here"])
         result = pii_removal_node(state)
 
         assert result["next_node"] == "clinical_analysis"
@@ -45,7 +45,7 @@ def test_pii_removal_node_no_pii():
         mock_anonymized.text = "Text with no PII"
         mock_anonymizer.anonymize.return_value = mock_anonymized
 
-        state = DummyState("<UNTRUSTED_DATA>\nSafe medical information\n</UNTRUSTED_DATA>")
+        state = DummyState(["Safe medical information"])
         result = pii_removal_node(state)
 
         assert result["next_node"] == "clinical_analysis"
@@ -57,7 +57,7 @@ def test_pii_removal_node_error():
     with patch("agents.document_processing.pii_removal.analyzer") as mock_analyzer:
         mock_analyzer.analyze.side_effect = Exception("Analyzer error")
 
-        state = DummyState("Some text")
+        state = DummyState(["Some text"])
         result = pii_removal_node(state)
 
         assert result["next_node"] == "compliance"
@@ -80,7 +80,7 @@ def test_pii_removal_node_nric():
         mock_anonymized.text = "Patient ID: [NRIC_FIN_1] is registered"
         mock_anonymizer.anonymize.return_value = mock_anonymized
 
-        state = DummyState("<UNTRUSTED_DATA>\nPatient NRIC: S1234567A medical record\n</UNTRUSTED_DATA>")
+        state = DummyState(["Patient NRIC: S1234567A medical record"])
         result = pii_removal_node(state)
 
         assert result["next_node"] == "clinical_analysis"
@@ -103,7 +103,7 @@ def test_pii_removal_node_email():
         mock_anonymized.text = "Contact: [EMAIL_ADDRESS_1] for follow-up"
         mock_anonymizer.anonymize.return_value = mock_anonymized
 
-        state = DummyState("<UNTRUSTED_DATA>\nContact: john.doe@hospital.com for follow-up\n</UNTRUSTED_DATA>")
+        state = DummyState(["Contact: john.doe@hospital.com for follow-up"])
         result = pii_removal_node(state)
 
         assert result["next_node"] == "clinical_analysis"
@@ -126,7 +126,7 @@ def test_pii_removal_node_address():
         mock_anonymized.text = "Address: [LOCATION_1] clinic"
         mock_anonymizer.anonymize.return_value = mock_anonymized
 
-        state = DummyState("<UNTRUSTED_DATA>\nAddress: 123 Medical Plaza, Singapore clinic\n</UNTRUSTED_DATA>")
+        state = DummyState(["Address: 123 Medical Plaza, Singapore clinic"])
         result = pii_removal_node(state)
 
         assert result["next_node"] == "clinical_analysis"
@@ -149,8 +149,37 @@ def test_pii_removal_node_phone():
         mock_anonymized.text = "Contact: [PHONE_NUMBER_1] for appointments"
         mock_anonymizer.anonymize.return_value = mock_anonymized
 
-        state = DummyState("<UNTRUSTED_DATA>\nContact: +65-6123-4567 for appointments\n</UNTRUSTED_DATA>")
+        state = DummyState(["Contact: +65-6123-4567 for appointments"])
         result = pii_removal_node(state)
 
         assert result["next_node"] == "clinical_analysis"
         assert "[PHONE_NUMBER_1]" in result["sanitized_text"]
+
+
+def test_pii_removal_node_consumes_parsed_pages():
+    """Test PII removal anonymizes page by page with placeholders shared across pages."""
+    with patch("agents.document_processing.pii_removal.analyzer") as mock_analyzer, \
+         patch("agents.document_processing.pii_removal.anonymizer") as mock_anonymizer:
+
+        def analyze(text, language, entities):
+            result = MagicMock(start=0, end=4, entity_type="PERSON")
+            return [result] if text.startswith("John") else []
+
+        def anonymize(text, analyzer_results, operators):
+            if not analyzer_results:
+                return MagicMock(text=text)
+            replacer = operators["PERSON"].params["lambda"]
+            return MagicMock(text=replacer(text[:4]) + text[4:])
+
+        mock_analyzer.analyze.side_effect = analyze
+        mock_anonymizer.anonymize.side_effect = anonymize
+
+        state = DummyState(["John page one", "Lab values", "John page three"])
+        result = pii_removal_node(state)
+
+        assert result["next_node"] == "clinical_analysis"
+        assert result["sanitized_text"] == (
+            "<UNTRUSTED_DATA>\n[PERSON_1] page one\nLab values\n[PERSON_1] page three\n</UNTRUSTED_DATA>"
+        )
+        assert mock_analyzer.analyze.call_count == 3
+        assert result["parsed_pages"] is None
@@ -0,0 +1,236 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import msgspec
+from cachetools import TTLCache
+
+from core.session import (
+    COMPRESS_MIN_BYTES,
+    COMPRESSED_PREFIX,
+    L1_MAX_SESSIONS,
+    L1_TTL_SECONDS,
+    Session,
+    SessionManager,
+    decode_session,
+    encode_session,
+    load_session,
+)
+
+
+def _session(session_id="sess_test", **fields):
+    return Session(session_id=session_id, created_at=0, last_active=0, **fields)
+
+
+def test_small_session_is_stored_uncompressed():
+    """Test sessions under the threshold round-trip as plain msgpack."""
+    session = _session()
+    payload = encode_session(session)
+
+    assert len(payload) <= COMPRESS_MIN_BYTES
+    assert not payload.startswith(COMPRESSED_PREFIX)
+    assert decode_session(payload) == session
+
+
+def test_large_session_is_compressed():
+    """Test sessions over the threshold are zstd-compressed and round-trip intact."""
+    turn = {"input_text_snippet": "What does my LDL mean? " * 8, "response_snippet": "Your LDL is high. " * 20}
+    session = _session(conversation_history=[dict(turn) for _ in range(20)], message_count=20)
+    payload = encode_session(session)
+
+    assert payload.startswith(COMPRESSED_PREFIX)
+    assert decode_session(payload) == session
+
+
+def test_load_session_treats_old_schema_as_missing():
+    """Test sessions stored with ISO-string timestamps are discarded rather than raising."""
+    old = msgspec.msgpack.encode(
+        {"session_id": "sess_old", "created_at": "2026-01-01T00:00:00+08:00", "last_active": "2026-01-01T00:00:00+08:00"}
+    )
+
+    assert load_session("sess_old", old) is None
+    assert load_session("sess_old", b"not msgpack") is None
+
+
+async def test_get_sessions_fetches_uncached_sessions_in_one_mget():
+    """Test cached sessions come from L1 and the rest from a single MGET, in order."""
+    redis = AsyncMock()
+    manager = SessionManager(redis)
+    cached, stored = _session("sess_cached"), _session("sess_stored")
+    manager._l1["sess_cached"] = encode_session(cached)
+    redis.mget.return_value = [encode_session(stored), None]
+
+    sessions = await manager.get_sessions(["sess_stored", "sess_cached", "sess_missing"])
+
+    redis.mget.assert_awaited_once_with(
+        ["msgpack-session:sess_stored", "msgpack-session:sess_missing"]
+    )
+    assert sessions == [stored, cached, None]
+
+
+def test_invalidation_drops_sessions_written_elsewhere():
+    """Test invalidations evict L1 entries unless they echo this process's own write."""
+    manager = SessionManager(AsyncMock())
+    manager._invalidation_task = object()  # tracking active
+    manager._l1["sess_a"] = encode_session(_session("sess_a"))
+    manager._l1["sess_b"] = encode_session(_session("sess_b"))
+    manager._note_own_write("msgpack-session:sess_b")
+
+    manager._invalidate([b"msgpack-session:sess_a", b"msgpack-session:sess_b"])
+    assert "sess_a" not in manager._l1
+    assert "sess_b" in manager._l1
+
+    # A second invalidation for sess_b is someone else's write
+    manager._invalidate([b"msgpack-session:sess_b"])
+    assert "sess_b" not in manager._l1
+
+
+def test_invalidation_flush_clears_l1():
+    """Test a null invalidation (server-side flush) clears the whole L1 cache."""
+    manager = SessionManager(AsyncMock())
+    manager._l1["sess_a"] = encode_session(_session("sess_a"))
+
+    manager._invalidate(None)
+    assert len(manager._l1) == 0
+
+
+async def test_invalidation_listener_falls_back_when_tracking_unavailable():
+    """Test the manager keeps working on TTL alone when tracking cannot be enabled."""
+    redis = MagicMock()
+    pubsub = redis.pubsub.return_value
+    pubsub.connect = AsyncMock(side_effect=ConnectionError("refused"))
+    pubsub.aclose = AsyncMock()
+    manager = SessionManager(redis)
+
+    await manager.start_invalidation_listener()
+
+    assert manager._invalidation_task is None
+    pubsub.aclose.assert_awaited_once()
+    await manager.close_invalidation_listener()
+
+
+async def test_extend_session_only_refreshes_ttl():
+    """Test extending a session is a single EXPIRE with no extra keys written."""
+    redis = AsyncMock()
+    manager = SessionManager(redis, ttl=100)
+    session = _session()
+
+    for _ in range(3):
+        await manager.extend_session("sess_test", session)
+
+    assert redis.expire.await_count == 3
+    redis.expire.assert_awaited_with("msgpack-session:sess_test", 100)
+    redis.set.assert_not_called()
+    redis.pipeline.assert_not_called()
+    assert session.last_active > 0
+
+
+async def test_extended_last_active_is_persisted_with_the_turn():
+    """Test last_active refreshed on access is what a later read gets back after the save."""
+    stored = {}
+    redis = AsyncMock()
+    redis.setex.side_effect = lambda key, ttl, payload: stored.__setitem__(key, payload)
+    redis.get.side_effect = lambda key: stored.get(key)
+    manager = SessionManager(redis)
+
+    created = await manager.get_or_create_session()
+    created.last_active = 0
+    await manager.save_session(created.session_id, created)
+    manager._l1.clear()
+
+    with patch("core.session.epoch", return_value=1_700_000_000):
+        session = await manager.get_or_create_session(created.session_id)
+    await manager.save_session(session.session_id, session)
+    manager._l1.clear()
+
+    reread = await manager.get_session(created.session_id)
+    assert reread.last_active == 1_700_000_000
+    assert list(stored) == [f"msgpack-session:{created.session_id}"]
+
+
+async def test_extend_does_not_expect_an_invalidation_echo():
+    """Test an EXPIRE (which may hit a missing key and echo nothing) doesn't mask a foreign write."""
+    manager = SessionManager(AsyncMock())
+    manager._invalidation_task = object()  # tracking active
+    session = _session("sess_a")
+    manager._l1["sess_a"] = encode_session(session)
+
+    await manager.extend_session("sess_a", session)
+    assert "msgpack-session:sess_a" not in manager._own_writes
+
+    # Another worker's write must still evict the cached copy
+    manager._invalidate([b"msgpack-session:sess_a"])
+    assert "sess_a" not in manager._l1
+
+
+async def test_failed_flush_rolls_back_expected_echoes():
+    """Test writes that never reached Redis don't leave echo counts behind."""
+    redis = MagicMock()
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(side_effect=ConnectionError("down"))
+    redis.pipeline.return_value.__aenter__.return_value = pipe
+    manager = SessionManager(redis)
+    manager._invalidation_task = object()  # tracking active
+    manager.start_writer()
+    await asyncio.sleep(0)  # let the drainer start
+
+    await manager.save_session("sess_a", _session("sess_a"))
+    await manager.close_writer()
+
+    assert "msgpack-session:sess_a" not in manager._own_writes
+
+
+def test_invalidation_ignores_non_session_keys():
+    """Test keys under the prefix that aren't session payloads don't touch L1."""
+    manager = SessionManager(AsyncMock())
+    manager._l1["sess_a"] = encode_session(_session("sess_a"))
+
+    manager._invalidate([b"msgpack-session:sess_a:last_active", b"other:sess_a"])
+    assert "sess_a" in manager._l1
+
+
+async def test_writer_stopped_before_it_runs_still_flushes():
+    """Test a writer closed right after starting flushes what was queued."""
+    redis = MagicMock()
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(return_value=[True])
+    redis.pipeline.return_value.__aenter__.return_value = pipe
+    manager = SessionManager(redis)
+    manager.start_writer()
+
+    await manager.save_session("sess_a", _session("sess_a"))
+    await manager.close_writer()
+
+    pipe.setex.assert_called_once()
+    pipe.execute.assert_awaited_once()
+
+
+async def test_cached_session_is_not_shared_between_readers():
+    """Test each L1 hit returns its own Session, so one request's edits don't leak into another's."""
+    manager = SessionManager(AsyncMock())
+    await manager.save_session("sess_a", _session("sess_a"))
+
+    first = await manager.get_session("sess_a")
+    first.conversation_history.append({"input_text_snippet": "hi"})
+    second = await manager.get_session("sess_a")
+
+    assert second is not first
+    assert second.conversation_history == []
+    manager.redis.get.assert_not_awaited()
+
+
+async def test_l1_hits_do_not_extend_the_cached_entry():
+    """Test a session read more often than the L1 TTL is still refetched once it expires."""
+    now = [0.0]
+    redis = AsyncMock()
+    manager = SessionManager(redis)
+    manager._l1 = TTLCache(maxsize=L1_MAX_SESSIONS, ttl=L1_TTL_SECONDS, timer=lambda: now[0])
+    redis.get.return_value = encode_session(_session("sess_a"))
+    await manager.get_session("sess_a")
+
+    # Another worker saves a turn; with tracking off, only the TTL notices
+    redis.get.return_value = encode_session(_session("sess_a", message_count=5))
+    for _ in range(5):
+        now[0] += L1_TTL_SECONDS * 2 / 3
+        session = await manager.get_session("sess_a")
+
+    assert session.message_count == 5